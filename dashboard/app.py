@@ -1,15 +1,33 @@
 """Streamlit dashboard for MongoDB aggregated data visualization."""
 
+from concurrent.futures import ThreadPoolExecutor
+
 import streamlit as st
 import plotly.express as px
 import plotly.graph_objects as go
 from pymongo import MongoClient
+from pymongoarrow.api import aggregate_pandas_all, find_pandas_all
+import numpy as np
 import pandas as pd
-from decimal import Decimal
-from typing import Any
 
 from src.config import settings
 
+# Aggregation collection suffixes written by the pipeline, with the fields each view uses
+AGGREGATION_FIELDS: dict[str, tuple[str, ...]] = {
+    "category": (
+        "total_revenue", "total_orders", "unique_customers", "avg_order_value", "total_quantity"
+    ),
+    "month": ("total_revenue", "total_orders"),
+    "status": (
+        "total_revenue", "total_orders", "unique_customers", "avg_order_value", "total_quantity"
+    ),
+    "user": ("total_revenue", "total_orders"),
+    "day_of_week": ("total_orders", "avg_order_value"),
+}
+
+# Display formats for currency columns in detail tables
+CURRENCY_FORMAT = {'total_revenue': '${:,.2f}', 'avg_order_value': '${:,.2f}'}
+
 
 # Page configuration
 st.set_page_config(
@@ -23,41 +41,57 @@ st.set_page_config(
 @st.cache_resource
 def get_mongo_client() -> MongoClient:
     """Create cached MongoDB connection."""
-    return MongoClient(settings.mongodb_uri)
+    return MongoClient(
+        settings.mongodb_uri,
+        serverSelectionTimeoutMS=2000,
+        **settings.mongodb_client_options
+    )
 
 
-def decimal_to_float(obj: Any) -> Any:
-    """Convert Decimal objects to float for JSON serialization."""
-    if isinstance(obj, Decimal):
-        return float(obj)
-    elif isinstance(obj, dict):
-        return {k: decimal_to_float(v) for k, v in obj.items()}
-    elif isinstance(obj, list):
-        return [decimal_to_float(item) for item in obj]
-    return obj
+@st.cache_data(ttl=300, show_spinner=False)
+def load_aggregation(
+    collection_suffix: str, fields: tuple[str, ...] | None = None
+) -> pd.DataFrame:
+    """Load aggregated data from MongoDB (cached for 5 minutes).
+    
+    Only ``_id`` and ``fields`` are fetched when ``fields`` is given.
+    """
+    client = get_mongo_client()
+    db = client[settings.mongodb_database]
+    collection_name = f"{settings.agg_collection}_{collection_suffix}"
+    projection = {field: 1 for field in fields} if fields else None
+    
+    # PyMongoArrow decodes BSON straight into Arrow columns, skipping per-document dicts
+    return find_pandas_all(db[collection_name], {}, projection=projection)
 
 
-def load_aggregation(collection_suffix: str) -> pd.DataFrame:
-    """Load aggregated data from MongoDB."""
+@st.cache_data(ttl=300, show_spinner=False)
+def load_top(collection_suffix: str, sort_field: str, n: int) -> pd.DataFrame:
+    """Load the top ``n`` aggregated documents by ``sort_field``, sorted by MongoDB."""
     client = get_mongo_client()
     db = client[settings.mongodb_database]
     collection_name = f"{settings.agg_collection}_{collection_suffix}"
     
-    data = list(db[collection_name].find())
-    
-    if not data:
-        return pd.DataFrame()
-    
-    # Convert Decimal to float
-    data = [decimal_to_float(doc) for doc in data]
-    
-    df = pd.DataFrame(data)
-    
-    # Remove MongoDB _id field if it's ObjectId
-    if '_id' in df.columns and 'id' in df.columns:
-        df = df.drop('id', axis=1)
+    pipeline = [{"$sort": {sort_field: -1}}, {"$limit": n}]
+    return aggregate_pandas_all(db[collection_name], pipeline)
+
+
+@st.cache_data(ttl=300, show_spinner=False)
+def load_totals() -> dict[str, float]:
+    """Load total revenue and orders across categories in a single aggregation."""
+    client = get_mongo_client()
+    db = client[settings.mongodb_database]
+    collection_name = f"{settings.agg_collection}_category"
     
-    return df
+    pipeline = [{"$group": {
+        "_id": None,
+        "total_revenue": {"$sum": "$total_revenue"},
+        "total_orders": {"$sum": "$total_orders"},
+    }}]
+    totals = next(db[collection_name].aggregate(pipeline), None)
+    if totals is None:
+        return {"total_revenue": 0.0, "total_orders": 0}
+    return {"total_revenue": totals["total_revenue"], "total_orders": totals["total_orders"]}
 
 
 def format_currency(value: float) -> str:
@@ -91,16 +125,24 @@ def main() -> None:
         )
         
         if st.button("Refresh Data"):
+            st.cache_data.clear()
             st.cache_resource.clear()
             st.rerun()
     
-    # Load data
+    # Load data (the five collections are independent, so fetch them concurrently)
     try:
-        category_df = load_aggregation("category")
-        month_df = load_aggregation("month")
-        status_df = load_aggregation("status")
-        user_df = load_aggregation("user")
-        dow_df = load_aggregation("day_of_week")
+        with ThreadPoolExecutor(max_workers=len(AGGREGATION_FIELDS)) as executor:
+            futures = {
+                name: executor.submit(load_aggregation, name, fields)
+                for name, fields in AGGREGATION_FIELDS.items()
+            }
+            dfs = {name: future.result() for name, future in futures.items()}
+        category_df = dfs["category"]
+        month_df = dfs["month"]
+        status_df = dfs["status"]
+        user_df = dfs["user"]
+        dow_df = dfs["day_of_week"]
+        nonempty = {name: not df.empty for name, df in dfs.items()}
     except Exception as e:
         st.error(f"Error loading data: {e}")
         st.info("Make sure the pipeline has been executed and data is available.")
@@ -113,9 +155,10 @@ def main() -> None:
         # KPI Metrics
         col1, col2, col3, col4 = st.columns(4)
         
-        total_revenue = category_df['total_revenue'].sum() if not category_df.empty else 0
-        total_orders = category_df['total_orders'].sum() if not category_df.empty else 0
-        unique_customers = user_df.shape[0] if not user_df.empty else 0
+        totals = load_totals()
+        total_revenue = totals['total_revenue']
+        total_orders = totals['total_orders']
+        unique_customers = len(user_df)
         avg_order_value = total_revenue / total_orders if total_orders > 0 else 0
         
         with col1:
@@ -134,9 +177,9 @@ def main() -> None:
         
         with col1:
             st.subheader("Revenue by Category")
-            if not category_df.empty:
+            if nonempty["category"]:
                 fig = px.bar(
-                    category_df.sort_values('total_revenue', ascending=False).head(10),
+                    load_top("category", "total_revenue", 10),
                     x='_id',
                     y='total_revenue',
                     title="Top 10 Categories by Revenue",
@@ -148,7 +191,7 @@ def main() -> None:
         
         with col2:
             st.subheader("Order Status Distribution")
-            if not status_df.empty:
+            if nonempty["status"]:
                 fig = px.pie(
                     status_df,
                     values='total_orders',
@@ -162,7 +205,7 @@ def main() -> None:
     elif view == "Category Analysis":
         st.header("Category Performance Analysis")
         
-        if category_df.empty:
+        if not nonempty["category"]:
             st.warning("No category data available")
             return
         
@@ -201,16 +244,16 @@ def main() -> None:
         
         # Detailed table
         st.subheader("Category Details")
-        display_df = category_df.copy()
-        display_df['total_revenue'] = display_df['total_revenue'].apply(lambda x: f"${x:,.2f}")
-        display_df['avg_order_value'] = display_df['avg_order_value'].apply(lambda x: f"${x:,.2f}")
-        st.dataframe(display_df, use_container_width=True)
+        st.dataframe(
+            category_df.style.format(CURRENCY_FORMAT),
+            use_container_width=True
+        )
     
     # Time Series View
     elif view == "Time Series":
         st.header("Temporal Trends Analysis")
         
-        if month_df.empty:
+        if not nonempty["month"]:
             st.warning("No temporal data available")
             return
         
@@ -247,7 +290,7 @@ def main() -> None:
         st.plotly_chart(fig, use_container_width=True)
         
         # Day of week analysis
-        if not dow_df.empty:
+        if nonempty["day_of_week"]:
             st.subheader("Day of Week Patterns")
             
             col1, col2 = st.columns(2)
@@ -280,14 +323,14 @@ def main() -> None:
     elif view == "Customer Insights":
         st.header("Customer Behavior Analysis")
         
-        if user_df.empty:
+        if not nonempty["user"]:
             st.warning("No customer data available")
             return
         
         # Top customers
         st.subheader("Top Customers by Revenue")
         
-        top_customers = user_df.nlargest(20, 'total_revenue')
+        top_customers = load_top("user", "total_revenue", 20)
         
         fig = px.bar(
             top_customers,
@@ -305,22 +348,38 @@ def main() -> None:
         
         with col1:
             st.subheader("Order Frequency Distribution")
-            fig = px.histogram(
-                user_df,
-                x='total_orders',
+            # Bin on the server so only bin edges/counts are sent to the browser
+            counts, edges = np.histogram(user_df['total_orders'].to_numpy(), bins=30)
+            fig = go.Figure(go.Bar(
+                x=edges[:-1],
+                y=counts,
+                width=np.diff(edges),
+                offset=0,
+                name='Customers'
+            ))
+            fig.update_layout(
                 title="Distribution of Orders per Customer",
-                labels={'total_orders': 'Number of Orders'},
-                nbins=30
+                xaxis=dict(title='Number of Orders'),
+                yaxis=dict(title='Customers'),
+                bargap=0
             )
             st.plotly_chart(fig, use_container_width=True)
         
         with col2:
             st.subheader("Customer Lifetime Value")
-            fig = px.box(
-                user_df,
-                y='total_revenue',
+            # Precomputed quartiles instead of shipping every customer row
+            q = np.quantile(user_df['total_revenue'].to_numpy(), [0, 0.25, 0.5, 0.75, 1])
+            fig = go.Figure(go.Box(
+                q1=[q[1]],
+                median=[q[2]],
+                q3=[q[3]],
+                lowerfence=[q[0]],
+                upperfence=[q[4]],
+                name='Customers'
+            ))
+            fig.update_layout(
                 title="Customer Revenue Distribution",
-                labels={'total_revenue': 'Total Revenue ($)'}
+                yaxis=dict(title='Total Revenue ($)')
             )
             st.plotly_chart(fig, use_container_width=True)
     
@@ -328,7 +387,7 @@ def main() -> None:
     elif view == "Status Distribution":
         st.header("Order Status Analysis")
         
-        if status_df.empty:
+        if not nonempty["status"]:
             st.warning("No status data available")
             return
         
@@ -358,10 +417,10 @@ def main() -> None:
         
         # Status details table
         st.subheader("Status Details")
-        display_df = status_df.copy()
-        display_df['total_revenue'] = display_df['total_revenue'].apply(lambda x: f"${x:,.2f}")
-        display_df['avg_order_value'] = display_df['avg_order_value'].apply(lambda x: f"${x:,.2f}")
-        st.dataframe(display_df, use_container_width=True)
+        st.dataframe(
+            status_df.style.format(CURRENCY_FORMAT),
+            use_container_width=True
+        )
 
 
 if __name__ == "__main__":
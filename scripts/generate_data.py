@@ -1,6 +1,9 @@
 """Script to generate sample e-commerce data for the pipeline."""
 
+import argparse
+import os
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 import numpy as np
@@ -10,7 +13,7 @@ from loguru import logger
 # Configuration
 DEFAULT_ROWS = 1_000_000
 DATA_DIR = Path(__file__).parent.parent / "data"
-OUTPUT_FILE = DATA_DIR / "raw_data.csv"
+OUTPUT_FILE = DATA_DIR / "raw_data.parquet"
 
 # Data generation parameters
 PRODUCTS = {
@@ -24,6 +27,15 @@ PRODUCTS = {
 STATUSES = ["completed", "pending", "cancelled", "returned"]
 STATUS_WEIGHTS = [0.7, 0.15, 0.1, 0.05]  # 70% completed, etc.
 
+# Price ranges (low, high) per category
+BASE_PRICES = {
+    "Electronics": (50, 2000),
+    "Clothing": (15, 200),
+    "Furniture": (30, 1500),
+    "Accessories": (10, 300),
+    "Sports": (20, 500),
+}
+
 
 def setup_logging() -> None:
     """Configure logging."""
@@ -35,103 +47,145 @@ def setup_logging() -> None:
     )
 
 
-def generate_data(n_rows: int, seed: int = 42) -> pd.DataFrame:
-    """Generate sample e-commerce data.
+def _generate_chunk(
+    seed_seq: np.random.SeedSequence, start: int, n_rows: int
+) -> pd.DataFrame:
+    """Generate one chunk of sample rows from an independent random stream.
     
     Args:
-        n_rows: Number of rows to generate
-        seed: Random seed for reproducibility
+        seed_seq: Seed sequence for this chunk's random generator
+        start: Global row offset of the chunk (used for order ids)
+        n_rows: Number of rows in the chunk
         
     Returns:
         DataFrame with generated data
     """
-    np.random.seed(seed)
-    
-    logger.info(f"Generating {n_rows:,} rows of sample data...")
-    
-    # Generate categories and products
-    categories = []
-    product_names = []
-    
-    for _ in range(n_rows):
-        category = np.random.choice(list(PRODUCTS.keys()))
-        product = np.random.choice(PRODUCTS[category])
-        categories.append(category)
-        product_names.append(product)
-    
-    # Generate price ranges based on category
-    base_prices = {
-        "Electronics": (50, 2000),
-        "Clothing": (15, 200),
-        "Furniture": (30, 1500),
-        "Accessories": (10, 300),
-        "Sports": (20, 500),
-    }
+    rng = np.random.default_rng(seed_seq)
+    
+    # Generate categories and products (one vectorized draw per column)
+    cat_array = np.array(list(PRODUCTS.keys()))
+    prod_matrix = np.array([PRODUCTS[c] for c in cat_array])
+    
+    cat_idx = rng.integers(0, len(cat_array), n_rows)
+    prod_idx = rng.integers(0, prod_matrix.shape[1], n_rows)
+    categories = cat_array[cat_idx]
+    product_names = prod_matrix[cat_idx, prod_idx]
     
-    prices = []
-    for cat in categories:
-        low, high = base_prices[cat]
-        price = np.random.uniform(low, high)
-        prices.append(round(price, 2))
+    # Generate prices from the category's price range
+    lows = np.array([BASE_PRICES[c][0] for c in cat_array], dtype=np.float64)
+    highs = np.array([BASE_PRICES[c][1] for c in cat_array], dtype=np.float64)
+    prices = np.round(rng.uniform(lows[cat_idx], highs[cat_idx], n_rows), 2)
     
     # Generate dates across 2024
     start_date = pd.Timestamp("2024-01-01")
     end_date = pd.Timestamp("2024-12-31")
     date_range = (end_date - start_date).days
     
-    random_days = np.random.randint(0, date_range, n_rows)
-    order_dates = [
-        (start_date + pd.Timedelta(days=int(d))).strftime("%Y-%m-%d")
-        for d in random_days
-    ]
+    random_days = rng.integers(0, date_range, n_rows)
+    order_dates = (
+        (start_date + pd.to_timedelta(random_days, unit="D")).strftime("%Y-%m-%d").to_numpy()
+    )
+    
+    # Generate zero-padded identifiers with vectorized string ops
+    order_nums = np.arange(start, start + n_rows)
+    order_ids = np.char.add("ORD-", np.char.zfill(order_nums.astype(str), 8))
+    product_nums = rng.integers(1, 5000, n_rows)
+    product_ids = np.char.add("PROD-", np.char.zfill(product_nums.astype(str), 5))
     
-    # Create DataFrame
+    # Every column is already a typed ndarray, so the constructor skips dtype inference
     data = {
-        "user_id": np.random.randint(1, 50000, n_rows),
-        "order_id": [f"ORD-{i:08d}" for i in range(n_rows)],
-        "product_id": [f"PROD-{np.random.randint(1, 5000):05d}" for _ in range(n_rows)],
+        "user_id": rng.integers(1, 50000, n_rows, dtype=np.int32),
+        "order_id": order_ids,
+        "product_id": product_ids,
         "product_name": product_names,
         "category": categories,
         "price": prices,
-        "quantity": np.random.randint(1, 10, n_rows),
+        "quantity": rng.integers(1, 10, n_rows, dtype=np.int32),
         "order_date": order_dates,
-        "status": np.random.choice(STATUSES, n_rows, p=STATUS_WEIGHTS),
+        "status": rng.choice(STATUSES, n_rows, p=STATUS_WEIGHTS),
     }
     
-    df = pd.DataFrame(data)
+    return pd.DataFrame(data, copy=False)
+
+
+def generate_data(n_rows: int, seed: int = 42, n_jobs: int = 1) -> pd.DataFrame:
+    """Generate sample e-commerce data.
+    
+    Rows are generated in ``n_jobs`` independent chunks, each with its own
+    random stream spawned from ``seed``, so chunks can run in parallel.
+    
+    Args:
+        n_rows: Number of rows to generate
+        seed: Random seed for reproducibility
+        n_jobs: Number of worker processes
+        
+    Returns:
+        DataFrame with generated data
+    """
+    n_jobs = max(1, min(n_jobs, n_rows))
+    seed_seq = np.random.SeedSequence(seed)
+    issues_seq, *chunk_seqs = seed_seq.spawn(n_jobs + 1)
+    rng = np.random.default_rng(issues_seq)
+    
+    logger.info(f"Generating {n_rows:,} rows of sample data ({n_jobs} job(s))...")
+    
+    bounds = np.linspace(0, n_rows, n_jobs + 1, dtype=np.int64)
+    starts = [int(b) for b in bounds[:-1]]
+    sizes = [int(b) for b in np.diff(bounds)]
+    
+    if n_jobs == 1:
+        df = _generate_chunk(chunk_seqs[0], 0, n_rows)
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            chunks = list(executor.map(_generate_chunk, chunk_seqs, starts, sizes))
+        df = pd.concat(chunks, ignore_index=True)
     
     # Add some intentional data quality issues for cleaning demo
     # (about 0.5% of data will have issues)
     n_issues = int(n_rows * 0.005)
     
-    # Some missing product names
-    missing_idx = np.random.choice(df.index, n_issues // 3, replace=False)
-    df.loc[missing_idx, "product_name"] = None
-    
-    # Some missing categories  
-    missing_idx = np.random.choice(df.index, n_issues // 3, replace=False)
-    df.loc[missing_idx, "category"] = None
+    # Some missing product names and categories, drawn once so the two sets never overlap
+    n_missing = n_issues // 3
+    picked = rng.choice(n_rows, 2 * n_missing, replace=False)
+    for col, idx in (("product_name", picked[:n_missing]), ("category", picked[n_missing:])):
+        missing = np.zeros(n_rows, dtype=bool)
+        missing[idx] = True
+        df[col] = df[col].mask(missing)
     
     logger.info(f"Added {n_issues} intentional data quality issues for cleaning demo")
     
+    # Low-cardinality columns are stored as categoricals (dictionary-encoded in Parquet)
+    for col in ("category", "product_name", "status"):
+        df[col] = df[col].astype("category")
+    
     return df
 
 
-def save_data(df: pd.DataFrame, output_path: Path) -> None:
-    """Save DataFrame to CSV file.
+def save_data(df: pd.DataFrame, output_path: Path, file_format: str = "parquet") -> Path:
+    """Save DataFrame to a Parquet (default) or CSV file.
     
     Args:
         df: DataFrame to save
-        output_path: Path to output file
+        output_path: Path to output file (suffix is replaced to match the format)
+        file_format: Either "parquet" or "csv"
+        
+    Returns:
+        Path of the written file
     """
     # Create data directory if it doesn't exist
     output_path.parent.mkdir(parents=True, exist_ok=True)
     
-    df.to_csv(output_path, index=False)
+    if file_format == "csv":
+        output_path = output_path.with_suffix(".csv")
+        df.to_csv(output_path, index=False)
+    else:
+        output_path = output_path.with_suffix(".parquet")
+        df.to_parquet(output_path, engine="pyarrow", compression="snappy", index=False)
     
     file_size = output_path.stat().st_size / (1024 * 1024)  # MB
     logger.info(f"Saved {len(df):,} rows to {output_path}")
     logger.info(f"   File size: {file_size:.2f} MB")
+    return output_path
 
 
 def main() -> None:
@@ -143,20 +197,23 @@ def main() -> None:
     logger.info("=" * 50)
     
     # Parse command line arguments
-    n_rows = DEFAULT_ROWS
-    if len(sys.argv) > 1:
-        try:
-            n_rows = int(sys.argv[1])
-        except ValueError:
-            logger.error(f"Invalid number of rows: {sys.argv[1]}")
-            sys.exit(1)
+    parser = argparse.ArgumentParser(description="Generate sample e-commerce data")
+    parser.add_argument("n_rows", nargs="?", type=int, default=DEFAULT_ROWS,
+                        help="Number of rows to generate")
+    parser.add_argument("--format", dest="file_format", choices=["parquet", "csv"],
+                        default="parquet", help="Output file format")
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="Worker processes for generation (0 = all CPU cores)")
+    args = parser.parse_args()
+    n_rows = args.n_rows
+    n_jobs = args.jobs or os.cpu_count() or 1
     
     logger.info(f"Target rows: {n_rows:,}")
-    logger.info(f"Output file: {OUTPUT_FILE}")
+    logger.info(f"Output format: {args.file_format}")
     
     # Generate and save data
-    df = generate_data(n_rows)
-    save_data(df, OUTPUT_FILE)
+    df = generate_data(n_rows, n_jobs=n_jobs)
+    save_data(df, OUTPUT_FILE, args.file_format)
     
     # Show summary
     logger.info("\n--- Data Summary ---")
@@ -5,11 +5,14 @@ from pathlib import Path
 from loguru import logger
 
 from src.config import settings
+from src.db import get_client
 from src.ingestion import DataIngestion
 from src.cleaning import DataCleaning
 from src.aggregation import DataAggregation
 from src.models import PipelineMetrics
 
+DATA_FILES = [Path("data/raw_data.parquet"), Path("data/raw_data.csv")]
+
 
 def setup_logging() -> None:
     """Configure logging for the pipeline."""
@@ -50,27 +53,30 @@ def main() -> None:
     
     all_metrics = []
     
+    # One client (and connection pool) shared by every stage, closed at exit
+    client = get_client()
+    
     try:
         # Stage 1: Data Ingestion
         logger.info("\n" + "="*60)
         logger.info("STAGE 1: DATA INGESTION")
         logger.info("="*60)
         
-        ingestion = DataIngestion()
+        ingestion = DataIngestion(client)
         
         # Setup sharding
         logger.info("Setting up sharding...")
         ingestion.setup_sharding()
         
-        # Ingest data
-        data_file = Path("data/raw_data.csv")
-        if not data_file.exists():
-            logger.error(f"Data file not found: {data_file}")
-            logger.info("Please place your dataset in data/raw_data.csv")
+        # Ingest data (prefer Parquet, fall back to CSV)
+        data_file = next((f for f in DATA_FILES if f.exists()), None)
+        if data_file is None:
+            logger.error(f"Data file not found: {', '.join(str(f) for f in DATA_FILES)}")
+            logger.info("Please place your dataset in data/raw_data.parquet or data/raw_data.csv")
             logger.info("Or run: uv run python scripts/generate_data.py")
             return
         
-        ingestion_metrics = ingestion.ingest_from_csv(data_file)
+        ingestion_metrics = ingestion.ingest_from_file(data_file)
         print_metrics(ingestion_metrics)
         all_metrics.append(ingestion_metrics)
         
@@ -82,14 +88,12 @@ def main() -> None:
         logger.info(f"Number of fields: {schema_info.get('field_count', 0)}")
         logger.info(f"Fields: {', '.join(schema_info.get('fields', []))}")
         
-        ingestion.close()
-        
         # Stage 2: Data Cleaning
         logger.info("\n" + "="*60)
         logger.info("STAGE 2: DATA CLEANING")
         logger.info("="*60)
         
-        cleaner = DataCleaning()
+        cleaner = DataCleaning(client)
         cleaning_metrics = cleaner.run_cleaning_pipeline()
         print_metrics(cleaning_metrics)
         all_metrics.append(cleaning_metrics)
@@ -100,26 +104,25 @@ def main() -> None:
         logger.info(f"Clean collection row count: {quality_report['total_rows']:,}")
         logger.info(f"Numeric stats: {quality_report['numeric_stats']}")
         
-        cleaner.close()
-        
         # Stage 3: Data Aggregation
         logger.info("\n" + "="*60)
         logger.info("STAGE 3: DATA AGGREGATION")
         logger.info("="*60)
         
-        aggregator = DataAggregation()
+        aggregator = DataAggregation(client)
         aggregation_metrics = aggregator.run_aggregation_pipeline()
         print_metrics(aggregation_metrics)
         all_metrics.append(aggregation_metrics)
         
+        # Index the aggregation collections for dashboard top-N queries
+        aggregator.create_indexes()
+        
         # Show summary stats
         logger.info("\nGenerating summary statistics...")
         summary = aggregator.get_summary_stats()
         for key, value in summary.items():
             logger.info(f"{key}: {value}")
         
-        aggregator.close()
-        
         # Final Summary
         logger.info("\n" + "="*60)
         logger.info("PIPELINE EXECUTION SUMMARY")
@@ -10,6 +10,7 @@ from pymongo.errors import OperationFailure
 # Add src to path for imports
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
+from src.cleaning import CLEAN_INDEXES
 from src.config import settings
 
 
@@ -112,11 +113,7 @@ def create_indexes(client: MongoClient, database: str) -> None:
     
     # Indexes for clean_data collection
     clean_collection = db[settings.clean_collection]
-    clean_collection.create_index([("user_id", 1)])
-    clean_collection.create_index([("order_date", -1)])
-    clean_collection.create_index([("category", 1)])
-    clean_collection.create_index([("status", 1)])
-    clean_collection.create_index([("year", 1), ("month", 1)])
+    clean_collection.create_indexes(CLEAN_INDEXES)
     logger.info(f"Created indexes on {settings.clean_collection}")
 
 
@@ -193,7 +190,8 @@ def get_collection_stats(client: MongoClient, database: str) -> dict:
     
     for collection_name in db.list_collection_names():
         collection = db[collection_name]
-        count = collection.count_documents({})
+        # Metadata-based count; exactness is not needed for this report
+        count = collection.estimated_document_count()
         stats[collection_name] = {
             "document_count": count,
             "indexes": list(collection.index_information().keys())
@@ -214,7 +212,7 @@ def main() -> None:
     logger.info(f"Database: {settings.mongodb_database}")
     
     # Connect to MongoDB
-    client = MongoClient(settings.mongodb_uri)
+    client = MongoClient(settings.mongodb_uri, **settings.mongodb_client_options)
     
     if not check_connection(client):
         logger.error("Cannot proceed without MongoDB connection")
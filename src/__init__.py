@@ -9,6 +9,7 @@ This package provides modules for:
 """
 
 from src.config import settings
+from src.db import get_client
 from src.models import (
     AggregatedDataModel,
     CleanDataModel,
@@ -32,6 +33,7 @@ __version__ = "1.0.0"
 __all__ = [
     # Config
     "settings",
+    "get_client",
     # Models
     "RawDataModel",
     "CleanDataModel", 
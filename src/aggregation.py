@@ -1,246 +1,169 @@
-"""Data aggregation module using Pandas."""
+"""Data aggregation module using MongoDB aggregation pipelines."""
 
 import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any
 
-import pandas as pd
 from loguru import logger
-from pymongo import MongoClient
+from pymongo import MongoClient, errors
 
 from src.config import settings
+from src.db import get_client
 from src.models import PipelineMetrics
 
+# Suffixes of the aggregation collections written by the pipeline
+AGGREGATION_SUFFIXES = ("category", "month", "status", "user", "day_of_week")
+
+DAY_ORDER = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+
+def _group_stage(key: Any, **extra: Any) -> dict[str, Any]:
+    """Build a $group stage with the order and revenue metrics shared by all aggregations."""
+    return {"$group": {
+        "_id": key,
+        "total_orders": {"$sum": 1},
+        "total_revenue": {"$sum": "$total_amount"},
+        "avg_order_value": {"$avg": "$total_amount"},
+        **extra,
+    }}
+
+
+def _finalize_stage(**extra: Any) -> dict[str, Any]:
+    """Build a $set stage rounding revenue metrics to cents, plus any extra fields."""
+    return {"$set": {
+        "total_revenue": {"$round": ["$total_revenue", 2]},
+        "avg_order_value": {"$round": ["$avg_order_value", 2]},
+        **extra,
+    }}
+
 
 class DataAggregation:
-    """Handle data aggregation operations using Pandas."""
+    """Handle data aggregation operations in MongoDB."""
     
     def __init__(self, client: MongoClient | None = None) -> None:
         """Initialize with MongoDB connection.
         
         Args:
-            client: Optional existing MongoClient instance
+            client: Optional MongoClient (defaults to the shared client)
         """
-        if client is None:
-            self.client = MongoClient(settings.mongodb_uri)
-            self._owns_client = True
-        else:
-            self.client = client
-            self._owns_client = False
+        self.client = client if client is not None else get_client()
         
         self.db = self.client[settings.mongodb_database]
         logger.info("DataAggregation initialized")
     
-    def read_from_mongodb(self, collection: str) -> pd.DataFrame:
-        """Read data from MongoDB collection."""
-        logger.info(f"Reading from MongoDB collection: {collection}")
-        
-        cursor = self.db[collection].find()
-        df = pd.DataFrame(list(cursor))
-        
-        if "_id" in df.columns:
-            df = df.drop("_id", axis=1)
+    def build_pipelines(self) -> dict[str, list[dict[str, Any]]]:
+        """Build server-side aggregation pipelines over the clean collection.
         
-        logger.info(f"Loaded {len(df)} rows from {collection}")
-        return df
-    
-    def aggregate_by_category(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Aggregate metrics by product category.
+        Each pipeline runs inside MongoDB, so only the small grouped result
+        is produced.
         
-        Args:
-            df: Input DataFrame
-            
         Returns:
-            Aggregated DataFrame by category
+            Mapping of collection suffix to aggregation pipeline
         """
-        logger.info("Aggregating by category...")
-        
-        agg_df = df.groupby("category").agg(
-            total_orders=("order_id", "count"),
-            total_revenue=("total_amount", "sum"),
-            avg_order_value=("total_amount", "mean"),
-            unique_customers=("user_id", "nunique"),
-            total_quantity=("quantity", "sum"),
-            first_order_date=("order_date", "min"),
-            last_order_date=("order_date", "max"),
-        ).reset_index()
-        
-        agg_df = agg_df.rename(columns={"category": "_id"})
-        agg_df["total_revenue"] = agg_df["total_revenue"].round(2)
-        agg_df["avg_order_value"] = agg_df["avg_order_value"].round(2)
-        agg_df = agg_df.sort_values("total_revenue", ascending=False)
-        
-        logger.info(f"Category aggregation complete: {len(agg_df)} categories")
-        return agg_df
-    
-    def aggregate_by_month(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Aggregate metrics by year-month.
-        
-        Args:
-            df: Input DataFrame
-            
-        Returns:
-            Aggregated DataFrame by month
-        """
-        logger.info("Aggregating by month...")
-        
-        df = df.copy()
-        df["year_month"] = df["order_date"].dt.strftime("%Y-%m")
-        
-        agg_df = df.groupby("year_month").agg(
-            total_orders=("order_id", "count"),
-            total_revenue=("total_amount", "sum"),
-            avg_order_value=("total_amount", "mean"),
-            unique_customers=("user_id", "nunique"),
-            total_quantity=("quantity", "sum"),
-        ).reset_index()
-        
-        agg_df = agg_df.rename(columns={"year_month": "_id"})
-        agg_df["total_revenue"] = agg_df["total_revenue"].round(2)
-        agg_df["avg_order_value"] = agg_df["avg_order_value"].round(2)
-        agg_df = agg_df.sort_values("_id")
-        
-        logger.info(f"Monthly aggregation complete: {len(agg_df)} months")
-        return agg_df
-    
-    def aggregate_by_status(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Aggregate metrics by order status.
-        
-        Args:
-            df: Input DataFrame
-            
-        Returns:
-            Aggregated DataFrame by status
-        """
-        logger.info("Aggregating by status...")
-        
-        agg_df = df.groupby("status").agg(
-            total_orders=("order_id", "count"),
-            total_revenue=("total_amount", "sum"),
-            avg_order_value=("total_amount", "mean"),
-            unique_customers=("user_id", "nunique"),
-            total_quantity=("quantity", "sum"),
-        ).reset_index()
-        
-        agg_df = agg_df.rename(columns={"status": "_id"})
-        agg_df["total_revenue"] = agg_df["total_revenue"].round(2)
-        agg_df["avg_order_value"] = agg_df["avg_order_value"].round(2)
-        agg_df = agg_df.sort_values("total_orders", ascending=False)
-        
-        logger.info(f"Status aggregation complete: {len(agg_df)} statuses")
-        return agg_df
-    
-    def aggregate_by_user(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Aggregate metrics by user (top customers).
-        
-        Args:
-            df: Input DataFrame
-            
-        Returns:
-            Aggregated DataFrame by user
-        """
-        logger.info("Aggregating by user...")
-        
-        agg_df = df.groupby("user_id").agg(
-            total_orders=("order_id", "count"),
-            total_revenue=("total_amount", "sum"),
-            avg_order_value=("total_amount", "mean"),
-            total_quantity=("quantity", "sum"),
-            first_order_date=("order_date", "min"),
-            last_order_date=("order_date", "max"),
-            categories_purchased=("category", "nunique"),
-        ).reset_index()
-        
-        agg_df["_id"] = agg_df["user_id"].astype(str)
-        agg_df = agg_df.drop("user_id", axis=1)
-        agg_df["total_revenue"] = agg_df["total_revenue"].round(2)
-        agg_df["avg_order_value"] = agg_df["avg_order_value"].round(2)
-        agg_df = agg_df.sort_values("total_revenue", ascending=False).head(1000)
-        
-        logger.info(f"User aggregation complete: {len(agg_df)} top users")
-        return agg_df
+        return {
+            "category": [
+                _group_stage(
+                    "$category",
+                    unique_customers={"$addToSet": "$user_id"},
+                    total_quantity={"$sum": "$quantity"},
+                    first_order_date={"$min": "$order_date"},
+                    last_order_date={"$max": "$order_date"},
+                ),
+                _finalize_stage(unique_customers={"$size": "$unique_customers"}),
+                {"$sort": {"total_revenue": -1}},
+            ],
+            "month": [
+                _group_stage(
+                    "$year_month",
+                    unique_customers={"$addToSet": "$user_id"},
+                    total_quantity={"$sum": "$quantity"},
+                ),
+                {"$sort": {"_id": 1}},
+                _finalize_stage(
+                    _id={"$dateToString": {"format": "%Y-%m", "date": {"$dateFromParts": {
+                        "year": {"$floor": {"$divide": ["$_id", 100]}},
+                        "month": {"$mod": ["$_id", 100]},
+                    }}}},
+                    unique_customers={"$size": "$unique_customers"},
+                ),
+            ],
+            "status": [
+                _group_stage(
+                    "$status",
+                    unique_customers={"$addToSet": "$user_id"},
+                    total_quantity={"$sum": "$quantity"},
+                ),
+                _finalize_stage(unique_customers={"$size": "$unique_customers"}),
+                {"$sort": {"total_orders": -1}},
+            ],
+            "user": [
+                _group_stage(
+                    "$user_id",
+                    total_quantity={"$sum": "$quantity"},
+                    first_order_date={"$min": "$order_date"},
+                    last_order_date={"$max": "$order_date"},
+                    categories_purchased={"$addToSet": "$category"},
+                ),
+                # Adjacent $sort + $limit run as a bounded top-k, so only the
+                # top users reach the formatting stage
+                {"$sort": {"total_revenue": -1}},
+                {"$limit": 1000},
+                _finalize_stage(
+                    _id={"$toString": "$_id"},
+                    categories_purchased={"$size": "$categories_purchased"},
+                ),
+            ],
+            "day_of_week": [
+                _group_stage("$day_of_week", unique_customers={"$addToSet": "$user_id"}),
+                {"$sort": {"_id": 1}},
+                _finalize_stage(
+                    _id={"$arrayElemAt": [DAY_ORDER, "$_id"]},
+                    unique_customers={"$size": "$unique_customers"},
+                ),
+            ],
+        }
     
-    def aggregate_day_of_week(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Aggregate metrics by day of week.
+    def _run_server_aggregation(self, name: str, pipeline: list[dict[str, Any]]) -> int:
+        """Run one pipeline on the server, writing into its collection via $out.
         
         Args:
-            df: Input DataFrame
+            name: Collection suffix for the output collection
+            pipeline: Aggregation pipeline without an output stage
             
         Returns:
-            Aggregated DataFrame by day of week
+            Number of documents written
         """
-        logger.info("Aggregating by day of week...")
-        
-        agg_df = df.groupby("day_of_week").agg(
-            total_orders=("order_id", "count"),
-            total_revenue=("total_amount", "sum"),
-            avg_order_value=("total_amount", "mean"),
-            unique_customers=("user_id", "nunique"),
-        ).reset_index()
+        collection_name = f"{settings.agg_collection}_{name}"
         
-        # Sort by day order
-        day_order = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
-        agg_df["day_order"] = agg_df["day_of_week"].map(
-            {day: i for i, day in enumerate(day_order)}
+        self.db[settings.clean_collection].aggregate(
+            [*pipeline, {"$out": collection_name}], allowDiskUse=True
         )
-        agg_df = agg_df.sort_values("day_order").drop("day_order", axis=1)
-        agg_df = agg_df.rename(columns={"day_of_week": "_id"})
-        agg_df["total_revenue"] = agg_df["total_revenue"].round(2)
-        agg_df["avg_order_value"] = agg_df["avg_order_value"].round(2)
-        
-        logger.info(f"Day of week aggregation complete: {len(agg_df)} days")
-        return agg_df
-    
-    def write_to_mongodb(self, df: pd.DataFrame, collection_suffix: str) -> None:
-        """Write aggregated data to MongoDB.
-        
-        Args:
-            df: DataFrame to write
-            collection_suffix: Suffix for collection name
-        """
-        collection_name = f"{settings.agg_collection}_{collection_suffix}"
-        logger.info(f"Writing {len(df)} rows to {collection_name}")
+        count = self.db[collection_name].estimated_document_count()
         
-        # Drop existing collection
-        self.db[collection_name].drop()
-        
-        # Convert datetime columns to string for JSON serialization
-        df_copy = df.copy()
-        for col in df_copy.columns:
-            if pd.api.types.is_datetime64_any_dtype(df_copy[col]):
-                df_copy[col] = df_copy[col].dt.strftime("%Y-%m-%d %H:%M:%S")
-        
-        records = df_copy.to_dict("records")
-        if records:
-            self.db[collection_name].insert_many(records)
-        
-        logger.info(f"Successfully wrote to {collection_name}")
+        logger.info(f"Wrote {count} rows to {collection_name}")
+        return count
     
     def run_aggregation_pipeline(self) -> PipelineMetrics:
         """Execute the complete aggregation pipeline.
         
+        Grouping runs inside MongoDB, so the clean collection is never
+        transferred to the client.
+        
         Returns:
             PipelineMetrics with aggregation statistics
         """
         start_time = time.time()
-        total_records = 0
         
         try:
-            # Read cleaned data
-            clean_df = self.read_from_mongodb(settings.clean_collection)
+            pipelines = self.build_pipelines()
             
-            # Perform all aggregations
-            aggregations = {
-                "category": self.aggregate_by_category(clean_df),
-                "month": self.aggregate_by_month(clean_df),
-                "status": self.aggregate_by_status(clean_df),
-                "user": self.aggregate_by_user(clean_df),
-                "day_of_week": self.aggregate_day_of_week(clean_df),
-            }
-            
-            # Write each aggregation to MongoDB
-            for name, agg_df in aggregations.items():
-                self.write_to_mongodb(agg_df, name)
-                total_records += len(agg_df)
+            # Aggregations are independent, so run them concurrently
+            with ThreadPoolExecutor(max_workers=len(pipelines)) as executor:
+                futures = [
+                    executor.submit(self._run_server_aggregation, name, pipeline)
+                    for name, pipeline in pipelines.items()
+                ]
+                total_records = sum(future.result() for future in futures)
             
             execution_time = time.time() - start_time
             
@@ -261,22 +184,64 @@ class DataAggregation:
             logger.error(f"Aggregation pipeline failed: {e}")
             raise
     
+    def create_indexes(self) -> None:
+        """Create indexes backing top-N queries on the aggregation collections."""
+        for suffix in AGGREGATION_SUFFIXES:
+            collection_name = f"{settings.agg_collection}_{suffix}"
+            try:
+                self.db[collection_name].create_index([("total_revenue", -1)])
+                self.db[collection_name].create_index([("total_orders", -1)])
+            except errors.OperationFailure as e:
+                logger.warning(f"Index creation warning on {collection_name}: {e}")
+        
+        logger.info("Created indexes on aggregation collections")
+    
     def get_summary_stats(self) -> dict[str, Any]:
-        """Get summary statistics across all aggregations."""
-        clean_df = self.read_from_mongodb(settings.clean_collection)
+        """Get summary statistics across all aggregations.
+        
+        Computed with a single $group on the server, so only one document
+        is returned instead of the whole clean collection.
+        """
+        pipeline: list[dict[str, Any]] = [
+            {"$group": {
+                "_id": None,
+                "total_records": {"$sum": 1},
+                "unique_users": {"$addToSet": "$user_id"},
+                "unique_categories": {"$addToSet": "$category"},
+                "total_revenue": {"$sum": "$total_amount"},
+                "avg_order_value": {"$avg": "$total_amount"},
+                "date_min": {"$min": "$order_date"},
+                "date_max": {"$max": "$order_date"},
+            }},
+            {"$project": {
+                "_id": 0,
+                "total_records": 1,
+                "unique_users": {"$size": "$unique_users"},
+                "unique_categories": {"$size": "$unique_categories"},
+                "total_revenue": {"$round": ["$total_revenue", 2]},
+                "avg_order_value": {"$round": ["$avg_order_value", 2]},
+                "date_min": 1,
+                "date_max": 1,
+            }},
+        ]
+        result: dict[str, Any] = next(
+            self.db[settings.clean_collection].aggregate(pipeline, allowDiskUse=True), {}
+        )
         
         return {
-            "total_records": len(clean_df),
-            "unique_users": clean_df["user_id"].nunique(),
-            "unique_categories": clean_df["category"].nunique(),
-            "total_revenue": round(float(clean_df["total_amount"].sum()), 2),
-            "avg_order_value": round(float(clean_df["total_amount"].mean()), 2),
-            "date_range_start": str(clean_df["order_date"].min()),
-            "date_range_end": str(clean_df["order_date"].max()),
+            "total_records": result.get("total_records", 0),
+            "unique_users": result.get("unique_users", 0),
+            "unique_categories": result.get("unique_categories", 0),
+            "total_revenue": result.get("total_revenue", 0.0),
+            "avg_order_value": result.get("avg_order_value", 0.0),
+            "date_range_start": str(result.get("date_min")),
+            "date_range_end": str(result.get("date_max")),
         }
     
     def close(self) -> None:
-        """Close MongoDB connection if owned."""
-        if self._owns_client:
-            self.client.close()
-            logger.info("MongoDB connection closed")
+        """Release the MongoDB connection.
+        
+        The client is shared across stages and closed at interpreter exit
+        (see ``src.db.get_client``), so it is left open here.
+        """
+        logger.debug("Leaving shared MongoDB client open")
@@ -5,38 +5,76 @@ from typing import Any
 
 import pandas as pd
 from loguru import logger
-from pymongo import MongoClient
+from pymongo import IndexModel, MongoClient
+from pymongoarrow.api import Schema, find_pandas_all
 
 from src.config import settings
+from src.db import get_client
 from src.models import PipelineMetrics
 
+# Arrow schema of the raw collection, matching RawDataModel
+RAW_SCHEMA = Schema({
+    "user_id": int,
+    "order_id": str,
+    "product_id": str,
+    "product_name": str,
+    "category": str,
+    "price": float,
+    "quantity": int,
+    "order_date": str,
+    "status": str,
+})
+
+# Indexes on the clean collection, aligned with the aggregation groupings
+# (each compound index also serves queries on its leading field)
+CLEAN_INDEXES = [
+    IndexModel([("category", 1), ("total_amount", -1)], background=True),
+    IndexModel([("status", 1), ("order_date", -1)], background=True),
+    IndexModel([("user_id", 1), ("total_amount", -1)], background=True),
+    IndexModel([("year_month", 1), ("category", 1)], background=True),
+    IndexModel([("order_date", -1)], background=True),
+]
+
 
 class DataCleaning:
     """Handle data cleaning operations using Pandas."""
     
-    def __init__(self) -> None:
-        """Initialize MongoDB connection."""
-        self.client = MongoClient(settings.mongodb_uri)
+    def __init__(self, client: MongoClient | None = None) -> None:
+        """Initialize MongoDB connection.
+        
+        Args:
+            client: Optional MongoClient (defaults to the shared client)
+        """
+        self.client = client if client is not None else get_client()
+        
         self.db = self.client[settings.mongodb_database]
         logger.info(f"Connected to MongoDB: {settings.mongodb_uri}")
     
-    def read_from_mongodb(self, collection: str) -> pd.DataFrame:
+    def read_from_mongodb(
+        self, 
+        collection: str, 
+        schema: Schema | None = None
+    ) -> pd.DataFrame:
         """Read data from MongoDB collection.
         
+        BSON is decoded by PyMongoArrow straight into typed Arrow columns,
+        so no per-document Python dicts are built.
+        
         Args:
             collection: Collection name to read from
+            schema: Optional schema selecting and typing the fields to fetch
+                (all fields, with inferred types, if omitted)
             
         Returns:
             Pandas DataFrame
         """
         logger.info(f"Reading from MongoDB collection: {collection}")
         
-        cursor = self.db[collection].find()
-        df = pd.DataFrame(list(cursor))
-        
-        # Remove MongoDB's _id field if present
-        if "_id" in df.columns:
-            df = df.drop("_id", axis=1)
+        # A schema projects to its own fields; _id is never needed downstream
+        projection = None if schema is not None else {"_id": 0}
+        df = find_pandas_all(
+            self.db[collection], {}, schema=schema, projection=projection
+        )
         
         logger.info(f"Loaded {len(df)} rows from {collection}")
         return df
@@ -44,6 +82,10 @@ class DataCleaning:
     def clean_data(self, df: pd.DataFrame) -> pd.DataFrame:
         """Apply cleaning transformations to the data.
         
+        Text columns may be plain strings or categoricals (as Parquet input
+        is loaded); category and status come out as categoricals either way.
+        order_date may be ISO strings or an already-parsed datetime column.
+        
         Args:
             df: Input Pandas DataFrame
             
@@ -57,6 +99,14 @@ class DataCleaning:
         df = df.drop_duplicates()
         logger.info(f"Removed {initial_count - len(df)} duplicate rows")
         
+        # Arrow-backed strings run the str ops in C, and casting before filling
+        # lets categorical inputs take defaults outside their categories
+        df = df.astype({
+            "product_name": "string[pyarrow]",
+            "category": "string[pyarrow]",
+            "status": "string[pyarrow]",
+        })
+        
         # Handle missing values
         df["product_name"] = df["product_name"].fillna("Unknown Product")
         df["category"] = df["category"].fillna("Uncategorized")
@@ -68,9 +118,9 @@ class DataCleaning:
         logger.info(f"Rows after dropping nulls in critical fields: {len(df)}")
         
         # Normalize text fields
-        df["product_name"] = df["product_name"].astype(str).str.strip()
-        df["category"] = df["category"].astype(str).str.strip().str.title()
-        df["status"] = df["status"].astype(str).str.strip().str.lower()
+        df["product_name"] = df["product_name"].str.strip()
+        df["category"] = df["category"].str.strip().str.title()
+        df["status"] = df["status"].str.strip().str.lower()
         
         # Standardize status values
         status_map = {
@@ -79,27 +129,47 @@ class DataCleaning:
             "cancelled": "cancelled", "canceled": "cancelled",
             "returned": "returned", "refunded": "returned",
         }
-        df["status"] = df["status"].map(lambda x: status_map.get(x, "unknown"))
+        # Canonicalize the handful of distinct values, then remap the codes
+        status = df["status"].astype("category")
+        canonical = pd.Index(
+            [status_map.get(value, "unknown") for value in status.cat.categories]
+        )
+        categories = canonical.unique()
+        codes = categories.get_indexer(canonical)[status.cat.codes.to_numpy()]
+        df["status"] = pd.Categorical.from_codes(codes, categories=categories)
+        df["category"] = df["category"].astype("category")
         
-        # Parse and standardize dates
-        df["order_date"] = pd.to_datetime(df["order_date"], errors="coerce")
+        # Parse and standardize dates (explicit format avoids per-row inference);
+        # already-parsed datetime columns are used as they are
+        if not pd.api.types.is_datetime64_any_dtype(df["order_date"]):
+            df["order_date"] = pd.to_datetime(
+                df["order_date"], format="ISO8601", errors="coerce", cache=True
+            )
+        
+        # Ensure proper types
+        df["user_id"] = pd.to_numeric(df["user_id"], errors="coerce")
+        df["price"] = pd.to_numeric(df["price"], errors="coerce")
+        df["quantity"] = pd.to_numeric(df["quantity"], errors="coerce")
+        
+        # Remove invalid data with one fused mask and a single slice
+        valid = (
+            (df["price"] >= 0)
+            & (df["quantity"] > 0)
+            & (df["user_id"] > 0)
+            & df["order_date"].notna()
+        )
+        df = df.loc[valid]
+        
+        # Nulls are gone, so ids and quantities fit plain (non-nullable) small ints
+        df["user_id"] = pd.to_numeric(df["user_id"], downcast="integer")
+        df["quantity"] = pd.to_numeric(df["quantity"], downcast="integer")
         
         # Add derived columns
         df["total_amount"] = (df["price"] * df["quantity"]).round(2)
         df["year"] = df["order_date"].dt.year
         df["month"] = df["order_date"].dt.month
-        df["day_of_week"] = df["order_date"].dt.day_name()
-        
-        # Ensure proper types
-        df["user_id"] = pd.to_numeric(df["user_id"], errors="coerce").astype("Int64")
-        df["price"] = pd.to_numeric(df["price"], errors="coerce")
-        df["quantity"] = pd.to_numeric(df["quantity"], errors="coerce").astype("Int64")
-        
-        # Remove invalid data
-        df = df[df["price"] >= 0]
-        df = df[df["quantity"] > 0]
-        df = df[df["user_id"] > 0]
-        df = df.dropna(subset=["order_date"])
+        df["year_month"] = df["year"].astype("int32") * 100 + df["month"].astype("int32")
+        df["day_of_week"] = df["order_date"].dt.dayofweek.astype("int8")  # 0 = Monday
         
         final_count = len(df)
         logger.info(f"Cleaning complete: {final_count} valid rows")
@@ -115,20 +185,31 @@ class DataCleaning:
         """
         logger.info(f"Writing {len(df)} rows to MongoDB collection: {collection}")
         
-        # Drop existing collection
-        self.db[collection].drop()
+        target = self.db[collection]
         
-        # Convert DataFrame to dict records and insert
-        records = df.to_dict("records")
+        # Drop existing collection (and its indexes); create_indexes builds
+        # the current index set once the load is done
+        target.drop()
         
-        if records:
-            # Insert in batches
-            for i in range(0, len(records), settings.batch_size):
-                batch = records[i:i + settings.batch_size]
-                self.db[collection].insert_many(batch)
+        # Build documents one batch window at a time instead of converting the
+        # whole frame up front; Series.tolist yields BSON-encodable Python scalars
+        columns = df.columns.tolist()
+        for i in range(0, len(df), settings.batch_size):
+            window = df.iloc[i:i + settings.batch_size]
+            batch = [
+                dict(zip(columns, row, strict=True))
+                for row in zip(*(window[col].tolist() for col in columns), strict=True)
+            ]
+            # Unordered batches let mongos fan writes out across shards
+            target.insert_many(batch, ordered=False, bypass_document_validation=True)
         
         logger.info(f"Successfully wrote to {collection}")
     
+    def create_indexes(self) -> None:
+        """Create the clean collection's indexes."""
+        self.db[settings.clean_collection].create_indexes(CLEAN_INDEXES)
+        logger.info(f"Created indexes on {settings.clean_collection}")
+    
     def run_cleaning_pipeline(self) -> PipelineMetrics:
         """Execute the complete cleaning pipeline.
         
@@ -139,15 +220,16 @@ class DataCleaning:
         
         try:
             # Read raw data
-            raw_df = self.read_from_mongodb(settings.raw_collection)
+            raw_df = self.read_from_mongodb(settings.raw_collection, RAW_SCHEMA)
             initial_count = len(raw_df)
             
             # Clean data
             clean_df = self.clean_data(raw_df)
             final_count = len(clean_df)
             
-            # Write cleaned data
+            # Write cleaned data, then build its indexes in one pass after the load
             self.write_to_mongodb(clean_df, settings.clean_collection)
+            self.create_indexes()
             
             execution_time = time.time() - start_time
             
@@ -191,6 +273,9 @@ class DataCleaning:
         return report
     
     def close(self) -> None:
-        """Close MongoDB connection."""
-        self.client.close()
-        logger.info("MongoDB connection closed")
+        """Release the MongoDB connection.
+        
+        The client is shared across stages and closed at interpreter exit
+        (see ``src.db.get_client``), so it is left open here.
+        """
+        logger.debug("Leaving shared MongoDB client open")
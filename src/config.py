@@ -1,6 +1,6 @@
 """Configuration management for the MongoDB pipeline."""
 
-from typing import Literal
+from typing import Any, Literal
 from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -19,6 +19,16 @@ class Settings(BaseSettings):
     mongodb_host: str = Field(default="localhost", description="MongoDB host")
     mongodb_port: int = Field(default=27019, description="MongoDB port")
     mongodb_database: str = Field(default="bigdata_project", description="Database name")
+    mongodb_compressors: str = Field(
+        default="zstd,zlib", 
+        description="Wire protocol compressors, in order of preference"
+    )
+    mongodb_min_pool_size: int = Field(default=10, description="Connections kept warm per client")
+    mongodb_max_pool_size: int = Field(default=200, description="Maximum connections per client")
+    mongodb_max_idle_ms: int = Field(
+        default=300_000, 
+        description="Idle time before a pooled connection is closed"
+    )
     
     # Collections
     raw_collection: str = Field(default="raw_data", description="Raw data collection")
@@ -31,6 +41,12 @@ class Settings(BaseSettings):
     # Processing Configuration
     batch_size: int = Field(default=10000, description="Batch size for processing")
     chunk_size: int = Field(default=100000, description="Chunk size for data loading")
+    insert_batch_size: int = Field(default=1000, description="Maximum records per ingestion insert_many")
+    insert_workers: int = Field(default=16, description="Concurrent insert_many calls during ingestion")
+    strict_validation: bool = Field(
+        default=False, 
+        description="Check a sample of each file against RawDataModel during ingestion"
+    )
     
     # Logging
     log_level: Literal["DEBUG", "INFO", "WARNING", "ERROR"] = Field(
@@ -43,6 +59,19 @@ class Settings(BaseSettings):
     def mongodb_uri(self) -> str:
         """Generate MongoDB connection URI."""
         return f"mongodb://{self.mongodb_host}:{self.mongodb_port}"
+    
+    @property
+    def mongodb_client_options(self) -> dict[str, Any]:
+        """Keyword arguments for constructing a MongoClient."""
+        return {
+            "compressors": self.mongodb_compressors,
+            "minPoolSize": self.mongodb_min_pool_size,
+            "maxPoolSize": self.mongodb_max_pool_size,
+            "maxIdleTimeMS": self.mongodb_max_idle_ms,
+            # Bulk loads are rerun as a whole on failure, so skip write retries
+            "retryWrites": False,
+            "w": 1,
+        }
 
 
 # Global settings instance
@@ -0,0 +1,23 @@
+"""Shared MongoDB client for the pipeline."""
+
+import atexit
+from functools import lru_cache
+
+from pymongo import MongoClient
+
+from src.config import settings
+
+
+@lru_cache(maxsize=1)
+def get_client() -> MongoClient:
+    """Get the process-wide MongoClient.
+    
+    The client (and its connection pool and monitor threads) is created on
+    first use, shared by every pipeline stage, and closed at interpreter exit.
+    
+    Returns:
+        Shared MongoClient instance
+    """
+    client: MongoClient = MongoClient(settings.mongodb_uri, **settings.mongodb_client_options)
+    atexit.register(client.close)
+    return client
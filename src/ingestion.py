@@ -1,23 +1,77 @@
 """Data ingestion module for loading data into MongoDB."""
 
 import time
-from typing import Any, Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Iterable, Iterator
 from pathlib import Path
+import bson
 import pandas as pd
-from pymongo import MongoClient, errors
+import pyarrow.parquet as pq
+from pydantic import ValidationError
+from pymongo import IndexModel, MongoClient, errors
 from pymongo.collection import Collection
+from pymongo.write_concern import WriteConcern
 from loguru import logger
 
 from src.config import settings
-from src.models import RawDataModel, PipelineMetrics
+from src.db import get_client
+from src.models import RAW_LIST_ADAPTER, RawDataModel, PipelineMetrics
+
+# Half of MongoDB's 16 MB maximum BSON size
+_TARGET_BATCH_BYTES = 8_000_000
+
+# CSV column dtypes, so the parser skips type inference. Numeric columns are
+# read as text: validate_df coerces them, so a malformed cell drops its row
+# instead of failing the whole file
+CSV_DTYPES = {
+    "user_id": "string",
+    "order_id": "string",
+    "product_id": "string",
+    "product_name": "string",
+    "category": "string",
+    "price": "string",
+    "quantity": "string",
+    "order_date": "string",
+    "status": "string",
+}
+
+
+def _insert_batch_size(sample: dict[str, Any]) -> int:
+    """Pick the insert_many batch size from the encoded size of a sample record.
+    
+    Batches target half of MongoDB's 16 MB BSON limit, capped at
+    ``settings.insert_batch_size``: unordered-insert throughput plateaus at a
+    few hundred small documents per batch, so larger batches only add
+    latency, while much smaller ones are dominated by round trips.
+    
+    Args:
+        sample: A validated record representative of the data
+        
+    Returns:
+        Number of records per insert_many call
+    """
+    avg_doc_bytes = len(bson.encode(sample))
+    return min(settings.insert_batch_size, max(100, _TARGET_BATCH_BYTES // avg_doc_bytes))
+
+
+def _read_parquet_batches(file_path: Path) -> Iterator[pd.DataFrame]:
+    """Yield a Parquet file as DataFrames of at most ``settings.chunk_size`` rows."""
+    parquet_file = pq.ParquetFile(file_path)
+    for batch in parquet_file.iter_batches(batch_size=settings.chunk_size):
+        yield batch.to_pandas()
 
 
 class DataIngestion:
     """Handle data ingestion into MongoDB."""
     
-    def __init__(self) -> None:
-        """Initialize MongoDB connection."""
-        self.client = MongoClient(settings.mongodb_uri)
+    def __init__(self, client: MongoClient | None = None) -> None:
+        """Initialize MongoDB connection.
+        
+        Args:
+            client: Optional MongoClient (defaults to the shared client)
+        """
+        self.client = client if client is not None else get_client()
+        
         self.db = self.client[settings.mongodb_database]
         self.collection: Collection = self.db[settings.raw_collection]
         logger.info(f"Connected to MongoDB: {settings.mongodb_uri}")
@@ -31,9 +85,14 @@ class DataIngestion:
             admin_db.command({"enableSharding": settings.mongodb_database})
             logger.info(f"Sharding enabled on database: {settings.mongodb_database}")
             
-            # Create index on shard key
-            self.collection.create_index([(settings.shard_key, 1)])
-            logger.info(f"Index created on shard key: {settings.shard_key}")
+            # Create the hashed index backing the shard key (matching the
+            # shardCollection key below) plus a compound index so time-range
+            # queries per user stay targeted
+            self.collection.create_indexes([
+                IndexModel([(settings.shard_key, "hashed")], background=True),
+                IndexModel([(settings.shard_key, 1), ("order_date", 1)], background=True),
+            ])
+            logger.info(f"Indexes created on shard key: {settings.shard_key}")
             
             # Shard the collection
             admin_db.command({
@@ -48,49 +107,129 @@ class DataIngestion:
             else:
                 logger.warning(f"Sharding setup warning: {e}")
     
+    def validate_df(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Drop rows violating RawDataModel's constraints and coerce column types.
+        
+        The constraints are checked column-wise with
+        ``RawDataModel.validate_columns``, so no per-row model is built.
+        
+        Args:
+            df: Raw input DataFrame
+            
+        Returns:
+            Valid rows with the model's columns and dtypes
+        """
+        # Align with the model: missing optional columns become nulls, extras are dropped
+        df = df.reindex(columns=list(RawDataModel.model_fields))
+        # Parquet input may carry real timestamps; store them as the ISO strings
+        # RawDataModel expects, so the cleaning read (RAW_SCHEMA) does not null them
+        if pd.api.types.is_datetime64_any_dtype(df["order_date"]):
+            df = df.assign(order_date=df["order_date"].dt.strftime("%Y-%m-%dT%H:%M:%S"))
+        df = df.assign(**{
+            col: pd.to_numeric(df[col], errors="coerce")
+            for col in ("user_id", "price", "quantity")
+        })
+        valid = RawDataModel.validate_columns(df)
+        
+        failed_count = int((~valid).sum())
+        if failed_count:
+            failed_rows = valid.index[~valid][:5].tolist()  # Log first 5 failures
+            logger.warning(f"Validation failed for {failed_count} rows, e.g. rows {failed_rows}")
+        
+        return df.loc[valid].astype(
+            {"user_id": "int64", "price": "float64", "quantity": "int64"}
+        )
+    
+    def serialize_chunk(self, df: pd.DataFrame) -> list[dict[str, Any]]:
+        """Convert validated rows to insertable records.
+        
+        Args:
+            df: Rows already passed through ``validate_df``
+            
+        Returns:
+            One dict per row, with missing values as None
+        """
+        # Series.tolist yields Python scalars column by column; only columns
+        # with missing values pay for the None substitution
+        columns = df.columns.tolist()
+        values = [
+            series.astype(object).where(series.notna(), None).tolist()
+            if series.hasnans else series.tolist()
+            for _, series in df.items()
+        ]
+        return [dict(zip(columns, row, strict=True)) for row in zip(*values, strict=True)]
+    
     def validate_and_chunk_data(
         self, 
         df: pd.DataFrame, 
         chunk_size: int
     ) -> Iterator[list[dict[str, Any]]]:
-        """Validate data and yield chunks."""
+        """Validate data and yield chunks.
+        
+        Records are serialized straight from the validated frame, without
+        building a RawDataModel per row.
+        """
         total_rows = len(df)
-        valid_records = []
-        failed_count = 0
-        
-        for idx, row in df.iterrows():
-            try:
-                # Validate using Pydantic model
-                validated = RawDataModel(**row.to_dict())
-                valid_records.append(validated.model_dump(mode='json'))
-                
-                # Yield chunk when size reached
-                if len(valid_records) >= chunk_size:
-                    yield valid_records
-                    valid_records = []
-                    
-            except Exception as e:
-                failed_count += 1
-                if failed_count <= 5:  # Log first 5 failures
-                    logger.warning(f"Validation failed for row {idx}: {e}")
-        
-        # Yield remaining records
-        if valid_records:
-            yield valid_records
-        
-        logger.info(
-            f"Validation complete: {total_rows - failed_count}/{total_rows} records valid"
-        )
+        df = self.validate_df(df)
+        
+        for start in range(0, len(df), chunk_size):
+            yield self.serialize_chunk(df.iloc[start:start + chunk_size])
+        
+        logger.info(f"Validation complete: {len(df)}/{total_rows} records valid")
     
     def ingest_from_csv(self, file_path: str | Path) -> PipelineMetrics:
         """Ingest data from CSV file.
         
+        The file is parsed in ``settings.chunk_size`` row chunks, so memory
+        stays bounded by the chunk rather than the file, with the column
+        types given up front by ``CSV_DTYPES``.
+        
         Args:
             file_path: Path to CSV file
             
         Returns:
             PipelineMetrics with ingestion statistics
         """
+        return self._ingest_file(
+            file_path,
+            lambda path: pd.read_csv(
+                path, dtype=CSV_DTYPES, engine="c", chunksize=settings.chunk_size
+            )
+        )
+    
+    def ingest_from_parquet(self, file_path: str | Path) -> PipelineMetrics:
+        """Ingest data from Parquet file.
+        
+        Parquet keeps column dtypes, so no numeric re-parsing is needed, and
+        record batches are streamed ``settings.chunk_size`` rows at a time.
+        
+        Args:
+            file_path: Path to Parquet file
+            
+        Returns:
+            PipelineMetrics with ingestion statistics
+        """
+        return self._ingest_file(file_path, _read_parquet_batches)
+    
+    def ingest_from_file(self, file_path: str | Path) -> PipelineMetrics:
+        """Ingest data from a Parquet or CSV file based on its suffix.
+        
+        Args:
+            file_path: Path to data file
+            
+        Returns:
+            PipelineMetrics with ingestion statistics
+        """
+        if Path(file_path).suffix == ".parquet":
+            return self.ingest_from_parquet(file_path)
+        return self.ingest_from_csv(file_path)
+    
+    def _ingest_file(
+        self,
+        file_path: str | Path,
+        reader: Callable[[Path], Iterable[pd.DataFrame]]
+    ) -> PipelineMetrics:
+        """Stream a data file through the given chunk reader and insert it in chunks."""
         start_time = time.time()
         file_path = Path(file_path)
         
@@ -99,24 +238,33 @@ class DataIngestion:
         
         logger.info(f"Starting ingestion from: {file_path}")
         
-        # Read CSV in chunks
+        # Read file in chunks
         total_inserted = 0
         total_failed = 0
         
+        # Acknowledged by the primary but not journaled, so concurrent batches
+        # return quickly while cleaning can still read everything afterwards
+        writer = self.collection.with_options(write_concern=WriteConcern(w=1, j=False))
+        max_in_flight = 2 * settings.insert_workers
+        
         try:
-            # Read entire CSV first (for smaller files) or use chunksize for large files
-            df = pd.read_csv(file_path)
-            logger.info(f"Loaded {len(df)} rows from CSV")
-            
-            # Validate and insert in chunks
-            for chunk in self.validate_and_chunk_data(df, settings.chunk_size):
-                try:
-                    result = self.collection.insert_many(chunk, ordered=False)
-                    total_inserted += len(result.inserted_ids)
-                    logger.info(f"Inserted {len(result.inserted_ids)} records")
-                except errors.BulkWriteError as e:
-                    total_failed += len(e.details.get('writeErrors', []))
-                    logger.error(f"Bulk insert error: {e.details}")
+            with ThreadPoolExecutor(max_workers=settings.insert_workers) as executor:
+                in_flight: set[Future[tuple[int, int]]] = set()
+                
+                for batch in self._iter_insert_batches(reader(file_path)):
+                    # Bound the number of queued batches held in memory
+                    if len(in_flight) >= max_in_flight:
+                        done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            inserted, failed = future.result()
+                            total_inserted += inserted
+                            total_failed += failed
+                    in_flight.add(executor.submit(self._insert_chunk, writer, batch))
+                
+                for future in in_flight:
+                    inserted, failed = future.result()
+                    total_inserted += inserted
+                    total_failed += failed
             
             execution_time = time.time() - start_time
             
@@ -137,23 +285,84 @@ class DataIngestion:
             logger.error(f"Ingestion failed: {e}")
             raise
     
-    def get_row_count(self) -> int:
-        """Get total row count from collection."""
-        count = self.collection.count_documents({})
+    def _iter_insert_batches(
+        self, 
+        frames: Iterable[pd.DataFrame]
+    ) -> Iterator[list[dict[str, Any]]]:
+        """Validate frames and split the valid records into insert-sized batches.
+        
+        Args:
+            frames: DataFrames read from the input file
+            
+        Yields:
+            Batches of validated records sized by ``_insert_batch_size``
+        """
+        batch_size = None
+        for df in frames:
+            logger.info(f"Read {len(df)} rows")
+            for chunk in self.validate_and_chunk_data(df, settings.chunk_size):
+                if batch_size is None:
+                    # Full model validation runs on one sample per file
+                    if settings.strict_validation:
+                        self._check_sample(chunk[:100])
+                    batch_size = _insert_batch_size(chunk[0])
+                    logger.info(f"Inserting in batches of {batch_size} records")
+                for start in range(0, len(chunk), batch_size):
+                    yield chunk[start:start + batch_size]
+    
+    def _check_sample(self, records: list[dict[str, Any]]) -> None:
+        """Log a warning if sample records do not validate against RawDataModel."""
+        try:
+            RAW_LIST_ADAPTER.validate_python(records)
+        except ValidationError as e:
+            logger.warning(f"Sample rows do not match RawDataModel: {e}")
+    
+    def _insert_chunk(
+        self, 
+        collection: Collection, 
+        chunk: list[dict[str, Any]]
+    ) -> tuple[int, int]:
+        """Insert one validated chunk with an unordered bulk write.
+        
+        Args:
+            collection: Target collection (with the write concern to use)
+            chunk: Validated records
+            
+        Returns:
+            Tuple of (inserted, failed) record counts
+        """
+        try:
+            result = collection.insert_many(
+                chunk, ordered=False, bypass_document_validation=True
+            )
+            logger.info(f"Inserted {len(result.inserted_ids)} records")
+            return len(result.inserted_ids), 0
+        except errors.BulkWriteError as e:
+            logger.error(f"Bulk insert error: {e.details}")
+            return e.details.get('nInserted', 0), len(e.details.get('writeErrors', []))
+    
+    def get_row_count(self, exact: bool = False) -> int:
+        """Get total row count from collection.
+        
+        Args:
+            exact: Scan the collection for an exact count instead of reading
+                the estimate from collection metadata
+            
+        Returns:
+            Number of documents
+        """
+        if exact:
+            count = self.collection.count_documents({})
+        else:
+            count = self.collection.estimated_document_count()
         logger.info(f"Total documents in {settings.raw_collection}: {count}")
         return count
     
     def get_schema_info(self) -> dict[str, Any]:
         """Get schema information from collection."""
-        pipeline = [
-            {"$limit": 1000},
-            {"$project": {
-                field: {"$type": f"${field}"}
-                for field in RawDataModel.model_fields.keys()
-            }}
-        ]
-        
-        sample_doc = self.collection.find_one()
+        sample_doc = self.collection.find_one(
+            {}, projection={"_id": 0, **dict.fromkeys(RawDataModel.model_fields, 1)}
+        )
         if sample_doc:
             return {
                 "sample_document": sample_doc,
@@ -163,6 +372,9 @@ class DataIngestion:
         return {"error": "No documents found"}
     
     def close(self) -> None:
-        """Close MongoDB connection."""
-        self.client.close()
-        logger.info("MongoDB connection closed")
\ No newline at end of file
+        """Release the MongoDB connection.
+        
+        The client is shared across stages and closed at interpreter exit
+        (see ``src.db.get_client``), so it is left open here.
+        """
+        logger.debug("Leaving shared MongoDB client open")
\ No newline at end of file
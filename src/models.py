@@ -1,10 +1,16 @@
 """Pydantic models for schema validation."""
 
+import re
+import string
 from datetime import datetime
 from typing import Optional
-from pydantic import BaseModel, Field, validator, field_validator
+from pydantic import BaseModel, Field, TypeAdapter, validator, field_validator
 from decimal import Decimal
 
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+
 
 class RawDataModel(BaseModel):
     """Schema for raw data validation.
@@ -38,6 +44,53 @@ class RawDataModel(BaseModel):
             }
         }
     }
+    
+    @classmethod
+    def validate_columns(cls, df: pd.DataFrame) -> pd.Series:
+        """Check the field constraints column-wise over a whole DataFrame.
+        
+        Mirrors the Field constraints above with vectorized numpy comparisons,
+        so no model instance is built per row. Numeric columns should already
+        be numeric (unparseable values as NaN).
+        
+        Args:
+            df: DataFrame with the model's fields as columns
+            
+        Returns:
+            Boolean Series, True for rows that satisfy every constraint
+        """
+        def values(col: str) -> npt.NDArray[np.float64]:
+            return df[col].to_numpy(dtype="float64", na_value=np.nan)
+        
+        def integral(col: str) -> npt.NDArray[np.bool_]:
+            column = values(col)
+            return np.equal(column, np.floor(column))
+        
+        def non_empty(col: str) -> npt.NDArray[np.bool_]:
+            return df[col].fillna("").astype(str).str.len().to_numpy() >= 1
+        
+        mask: npt.NDArray[np.bool_] = (
+            (values("user_id") > 0)
+            & integral("user_id")
+            & (values("price") >= 0)
+            & (values("quantity") > 0)
+            & integral("quantity")
+            & non_empty("order_id")
+            & non_empty("product_id")
+            & df["order_date"].notna().to_numpy()
+        )
+        valid: pd.Series = pd.Series(mask, index=df.index)
+        return valid
+
+
+# Validates and dumps whole batches of raw records in one pydantic-core call
+RAW_LIST_ADAPTER = TypeAdapter(list[RawDataModel])
+
+
+# Precompiled normalizers for the CleanDataModel validators
+_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+_WHITESPACE = re.compile(r'\s+')
+_STATUSES = frozenset({'completed', 'pending', 'cancelled', 'returned'})
 
 
 class CleanDataModel(BaseModel):
@@ -55,15 +108,14 @@ class CleanDataModel(BaseModel):
     total_amount: Decimal = Field(..., ge=0, decimal_places=2)
     year: int = Field(..., ge=2000, le=2100)
     month: int = Field(..., ge=1, le=12)
-    day_of_week: str = Field(...)
+    day_of_week: int = Field(..., ge=0, le=6, description="Day of week (0 = Monday)")
     
     @field_validator('status')
     @classmethod
     def validate_status(cls, v: str) -> str:
         """Normalize status values."""
-        valid_statuses = {'completed', 'pending', 'cancelled', 'returned'}
-        normalized = v.lower().strip()
-        if normalized not in valid_statuses:
+        normalized = v.translate(_LOWER).strip()
+        if normalized not in _STATUSES:
             return 'unknown'
         return normalized
     
@@ -77,7 +129,7 @@ class CleanDataModel(BaseModel):
     @classmethod
     def normalize_product_name(cls, v: str) -> str:
         """Normalize product names."""
-        return ' '.join(v.strip().split())
+        return _WHITESPACE.sub(' ', v).strip()
     
     model_config = {
         "json_schema_extra": {
@@ -94,7 +146,7 @@ class CleanDataModel(BaseModel):
                 "total_amount": "999.99",
                 "year": 2024,
                 "month": 1,
-                "day_of_week": "Monday"
+                "day_of_week": 0
             }
         }
     }
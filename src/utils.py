@@ -1,14 +1,18 @@
 """Utility functions for the MongoDB pipeline."""
 
+import math
 import time
 from contextlib import contextmanager
 from functools import wraps
-from typing import Any, Callable, Generator, TypeVar
+from itertools import islice
+from typing import Any, Callable, Generator, Iterable, TypeVar
 
 from loguru import logger
 
 T = TypeVar("T")
 
+_BYTE_UNITS = ("B", "KB", "MB", "GB", "TB", "PB")
+
 
 @contextmanager
 def timer(operation_name: str) -> Generator[None, None, None]:
@@ -50,30 +54,27 @@ def retry(
     Returns:
         Decorated function with retry logic
     """
+    # Sleep before each retry; the final attempt runs outside the loop
+    delays = [delay * backoff**i for i in range(max_attempts - 1)]
+    
     def decorator(func: Callable[..., T]) -> Callable[..., T]:
         @wraps(func)
         def wrapper(*args: Any, **kwargs: Any) -> T:
-            current_delay = delay
-            last_exception: Exception | None = None
-            
-            for attempt in range(1, max_attempts + 1):
+            for attempt, current_delay in enumerate(delays, 1):
                 try:
                     return func(*args, **kwargs)
                 except exceptions as e:
-                    last_exception = e
-                    if attempt < max_attempts:
-                        logger.warning(
-                            f"{func.__name__} failed (attempt {attempt}/{max_attempts}): {e}. "
-                            f"Retrying in {current_delay:.1f}s..."
-                        )
-                        time.sleep(current_delay)
-                        current_delay *= backoff
-                    else:
-                        logger.error(
-                            f"{func.__name__} failed after {max_attempts} attempts: {e}"
-                        )
+                    logger.warning(
+                        f"{func.__name__} failed (attempt {attempt}/{max_attempts}): {e}. "
+                        f"Retrying in {current_delay:.1f}s..."
+                    )
+                    time.sleep(current_delay)
             
-            raise last_exception  # type: ignore[misc]
+            try:
+                return func(*args, **kwargs)
+            except exceptions as e:
+                logger.error(f"{func.__name__} failed after {max_attempts} attempts: {e}")
+                raise
         return wrapper
     return decorator
 
@@ -87,11 +88,11 @@ def format_bytes(size_bytes: int) -> str:
     Returns:
         Human-readable size string
     """
-    for unit in ["B", "KB", "MB", "GB", "TB"]:
-        if abs(size_bytes) < 1024:
-            return f"{size_bytes:.2f} {unit}"
-        size_bytes /= 1024  # type: ignore[assignment]
-    return f"{size_bytes:.2f} PB"
+    if size_bytes == 0:
+        return "0.00 B"
+    # Each unit is 2**10 times the previous one, so log2 // 10 picks the unit directly
+    i = min(len(_BYTE_UNITS) - 1, max(0, int(math.log2(abs(size_bytes)) // 10)))
+    return f"{size_bytes / (1 << (10 * i)):.2f} {_BYTE_UNITS[i]}"
 
 
 def format_number(num: int | float) -> str:
@@ -128,18 +129,22 @@ def format_duration(seconds: float) -> str:
         return f"{int(hours)}h {int(minutes)}m"
 
 
-def chunk_list(lst: list[T], chunk_size: int) -> Generator[list[T], None, None]:
-    """Split a list into chunks of specified size.
+def chunk_list(lst: Iterable[T], chunk_size: int) -> Generator[list[T], None, None]:
+    """Split an iterable into chunks of specified size.
+    
+    Consumes the input lazily, so generators are chunked without first
+    being materialized as a list.
     
     Args:
-        lst: List to split
+        lst: Iterable to split
         chunk_size: Size of each chunk
         
     Yields:
-        Chunks of the list
+        Chunks of the iterable
     """
-    for i in range(0, len(lst), chunk_size):
-        yield lst[i:i + chunk_size]
+    it = iter(lst)
+    while chunk := list(islice(it, chunk_size)):
+        yield chunk
 
 
 def safe_divide(numerator: float, denominator: float, default: float = 0.0) -> float:
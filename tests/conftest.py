@@ -3,6 +3,12 @@
 import pytest
 import sys
 from pathlib import Path
+from typing import Callable
+from unittest.mock import MagicMock
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
 
 # Add src to path for imports
 sys.path.insert(0, str(Path(__file__).parent.parent))
@@ -23,6 +29,86 @@ def setup_test_environment():
     pass
 
 
+@pytest.fixture(scope="session")
+def mongo_client() -> MagicMock:
+    """Create the mocked MongoClient shared by the session (one per xdist worker)."""
+    return MagicMock()
+
+
+@pytest.fixture(autouse=True)
+def mock_get_client(
+    monkeypatch: pytest.MonkeyPatch, mongo_client: MagicMock
+) -> MagicMock:
+    """Point every module's ``get_client`` at the shared mocked client.
+    
+    The client is reset before each test, so configured return values and
+    recorded calls never leak between tests.
+    """
+    mongo_client.reset_mock(return_value=True, side_effect=True)
+    factory = MagicMock(return_value=mongo_client)
+    for module in ("src.aggregation", "src.cleaning", "src.ingestion"):
+        monkeypatch.setattr(f"{module}.get_client", factory)
+    return factory
+
+
+@pytest.fixture(scope="session")
+def base_df() -> pd.DataFrame:
+    """Create a typed raw data frame shared by the whole session.
+    
+    The columns are built as an Arrow table with the raw collection's schema
+    and converted once, the same way ``DataCleaning.read_from_mongodb``
+    produces frames, so pandas never infers dtypes from Python objects.
+    The low-cardinality text columns are categoricals, as in the generated
+    Parquet data.
+    """
+    from src.cleaning import RAW_SCHEMA
+    
+    ids = np.arange(1, 6)
+    suffixes = np.char.zfill(ids.astype(str), 3)
+    
+    return pa.table({
+        "user_id": ids,
+        "order_id": np.char.add("ORD-", suffixes),
+        "product_id": np.char.add("PROD-", suffixes),
+        "product_name": ["Laptop", "Mouse", "Chair", "T-Shirt", "Watch"],
+        "category": ["electronics", "accessories", "furniture", "clothing", "accessories"],
+        "price": [999.99, 29.99, 199.99, 25.00, 150.00],
+        "quantity": [1, 2, 1, 3, 1],
+        "order_date": ["2024-01-15", "2024-01-16", "2024-01-17", "2024-01-18", "2024-01-19"],
+        "status": ["completed", "PENDING", "canceled", "refunded", "complete"],
+    }, schema=RAW_SCHEMA.to_arrow()).to_pandas().astype(
+        {"category": "category", "status": "category"}
+    )
+
+
+@pytest.fixture(scope="session")
+def make_df(base_df: pd.DataFrame) -> Callable[..., pd.DataFrame]:
+    """Build raw data frames from ``base_df`` with some columns overridden.
+    
+    The frame has as many rows as the override columns (all of ``base_df``
+    when called without overrides), e.g. ``make_df(price=[-10.0, 50.0])``.
+    """
+    def make(**overrides: list) -> pd.DataFrame:
+        n_rows = len(next(iter(overrides.values()))) if overrides else len(base_df)
+        return base_df.head(n_rows).assign(**overrides)
+    
+    return make
+
+
+@pytest.fixture(scope="session")
+def make_arrow_df(make_df: Callable[..., pd.DataFrame]) -> Callable[..., pd.DataFrame]:
+    """Build raw data frames like ``make_df``, with ``pd.ArrowDtype`` columns.
+    
+    Mirrors frames read with Arrow-backed dtypes (e.g. Parquet loaded with
+    ``types_mapper=pd.ArrowDtype``), converted column-wise in one pass.
+    """
+    def make(**overrides: list) -> pd.DataFrame:
+        table = pa.Table.from_pandas(make_df(**overrides), preserve_index=False)
+        return table.to_pandas(types_mapper=pd.ArrowDtype)
+    
+    return make
+
+
 def pytest_configure(config):
     """Configure pytest with custom markers."""
     config.addinivalue_line(
@@ -1,199 +1,145 @@
 """Test suite for the data aggregation module."""
 
 import pytest
-from unittest.mock import patch, MagicMock
-import pandas as pd
+from unittest.mock import MagicMock
 from datetime import datetime
 
 
 class TestDataAggregation:
     """Test cases for DataAggregation class."""
     
-    @pytest.fixture
-    def sample_clean_data(self) -> pd.DataFrame:
-        """Create sample cleaned data for aggregation tests."""
-        return pd.DataFrame({
-            "user_id": [1, 2, 1, 3, 4],
-            "order_id": ["ORD-001", "ORD-002", "ORD-003", "ORD-004", "ORD-005"],
-            "product_id": ["PROD-001", "PROD-002", "PROD-003", "PROD-004", "PROD-005"],
-            "product_name": ["Laptop", "Mouse", "Chair", "T-Shirt", "Jeans"],
-            "category": ["Electronics", "Electronics", "Furniture", "Clothing", "Clothing"],
-            "price": [999.99, 29.99, 199.99, 25.00, 50.00],
-            "quantity": [1, 2, 1, 3, 1],
-            "order_date": pd.to_datetime([
-                "2024-01-15", "2024-01-16", "2024-02-17", "2024-01-20", "2024-02-25"
-            ]),
-            "status": ["completed", "completed", "pending", "completed", "cancelled"],
-            "total_amount": [999.99, 59.98, 199.99, 75.00, 50.00],
-            "year": [2024, 2024, 2024, 2024, 2024],
-            "month": [1, 1, 2, 1, 2],
-            "day_of_week": ["Monday", "Tuesday", "Saturday", "Saturday", "Sunday"],
-        })
-    
-    @patch('src.aggregation.MongoClient')
-    def test_initialization(self, mock_mongo: MagicMock) -> None:
+    def test_initialization(self, mock_get_client: MagicMock) -> None:
         """Test DataAggregation initialization."""
         from src.aggregation import DataAggregation
         
         aggregator = DataAggregation()
         assert aggregator.client is not None
-        mock_mongo.assert_called_once()
-    
-    @patch('src.aggregation.MongoClient')
-    def test_aggregate_by_category(
-        self, mock_mongo: MagicMock, sample_clean_data: pd.DataFrame
-    ) -> None:
-        """Test category aggregation."""
-        from src.aggregation import DataAggregation
-        
-        aggregator = DataAggregation()
-        result = aggregator.aggregate_by_category(sample_clean_data)
-        
-        # Should have 3 categories
-        assert len(result) == 3
-        
-        # Check Electronics aggregation
-        electronics = result[result["_id"] == "Electronics"].iloc[0]
-        assert electronics["total_orders"] == 2
-        assert electronics["unique_customers"] == 2
+        mock_get_client.assert_called_once()
     
-    @patch('src.aggregation.MongoClient')
-    def test_aggregate_by_status(
-        self, mock_mongo: MagicMock, sample_clean_data: pd.DataFrame
-    ) -> None:
-        """Test status aggregation."""
-        from src.aggregation import DataAggregation
-        
-        aggregator = DataAggregation()
-        result = aggregator.aggregate_by_status(sample_clean_data)
-        
-        # Should have 3 unique statuses
-        assert len(result) == 3
-        
-        # Check completed orders
-        completed = result[result["_id"] == "completed"].iloc[0]
-        assert completed["total_orders"] == 3
-    
-    @patch('src.aggregation.MongoClient')
-    def test_aggregate_by_month(
-        self, mock_mongo: MagicMock, sample_clean_data: pd.DataFrame
-    ) -> None:
-        """Test monthly aggregation."""
-        from src.aggregation import DataAggregation
+    def test_create_indexes(self) -> None:
+        """Test that every aggregation collection gets its top-N indexes."""
+        from src.aggregation import AGGREGATION_SUFFIXES, DataAggregation
         
         aggregator = DataAggregation()
-        result = aggregator.aggregate_by_month(sample_clean_data)
+        aggregator.create_indexes()
         
-        # Should have 2 months
-        assert len(result) == 2
-        
-        # Check January 2024
-        jan_2024 = result[result["_id"] == "2024-01"].iloc[0]
-        assert jan_2024["total_orders"] == 3
+        collection = aggregator.db.__getitem__.return_value
+        assert collection.create_index.call_count == 2 * len(AGGREGATION_SUFFIXES)
+        collection.create_index.assert_any_call([("total_revenue", -1)])
+        collection.create_index.assert_any_call([("total_orders", -1)])
     
-    @patch('src.aggregation.MongoClient')
-    def test_aggregate_by_user(
-        self, mock_mongo: MagicMock, sample_clean_data: pd.DataFrame
-    ) -> None:
-        """Test user aggregation."""
-        from src.aggregation import DataAggregation
+    def test_run_aggregation_pipeline(self) -> None:
+        """Test that every aggregation runs on the server and writes via $out."""
+        from src.aggregation import AGGREGATION_SUFFIXES, DataAggregation
+        from src.config import settings
         
         aggregator = DataAggregation()
-        result = aggregator.aggregate_by_user(sample_clean_data)
+        collection = aggregator.db.__getitem__.return_value
+        collection.estimated_document_count.return_value = 3
         
-        # Should have 4 unique users
-        assert len(result) == 4
+        metrics = aggregator.run_aggregation_pipeline()
         
-        # User 1 has 2 orders
-        user_1 = result[result["_id"] == "1"].iloc[0]
-        assert user_1["total_orders"] == 2
-        assert user_1["categories_purchased"] == 2
+        outputs = {
+            call.args[0][-1]["$out"] for call in collection.aggregate.call_args_list
+        }
+        assert outputs == {f"{settings.agg_collection}_{s}" for s in AGGREGATION_SUFFIXES}
+        assert metrics.records_processed == 3 * len(AGGREGATION_SUFFIXES)
     
-    @patch('src.aggregation.MongoClient')
-    def test_aggregate_day_of_week(
-        self, mock_mongo: MagicMock, sample_clean_data: pd.DataFrame
-    ) -> None:
-        """Test day of week aggregation."""
-        from src.aggregation import DataAggregation
+    def test_build_pipelines(self) -> None:
+        """Test the server-side pipeline definitions."""
+        from src.aggregation import AGGREGATION_SUFFIXES, DataAggregation
         
         aggregator = DataAggregation()
-        result = aggregator.aggregate_day_of_week(sample_clean_data)
-        
-        # Check that days are present
-        days = result["_id"].tolist()
-        assert "Monday" in days
-        assert "Tuesday" in days
-        assert "Saturday" in days
-        assert "Sunday" in days
-        
-        # Saturday has 2 orders
-        saturday = result[result["_id"] == "Saturday"].iloc[0]
-        assert saturday["total_orders"] == 2
+        pipelines = aggregator.build_pipelines()
+        
+        assert set(pipelines) == set(AGGREGATION_SUFFIXES)
+        for pipeline in pipelines.values():
+            group = pipeline[0]["$group"]
+            assert group["total_orders"] == {"$sum": 1}
+            assert group["total_revenue"] == {"$sum": "$total_amount"}
+            assert group["avg_order_value"] == {"$avg": "$total_amount"}
+            finalize = next(stage["$set"] for stage in pipeline if "$set" in stage)
+            assert finalize["total_revenue"] == {"$round": ["$total_revenue", 2]}
+            assert finalize["avg_order_value"] == {"$round": ["$avg_order_value", 2]}
     
-    @patch('src.aggregation.MongoClient')
-    def test_revenue_calculation(
-        self, mock_mongo: MagicMock, sample_clean_data: pd.DataFrame
-    ) -> None:
-        """Test that revenue is calculated correctly."""
+    @pytest.mark.parametrize(
+        "name, key, fields",
+        [
+            ("category", "$category", {
+                "unique_customers", "total_quantity", "first_order_date", "last_order_date",
+            }),
+            ("month", "$year_month", {"unique_customers", "total_quantity"}),
+            ("status", "$status", {"unique_customers", "total_quantity"}),
+            ("user", "$user_id", {
+                "total_quantity", "first_order_date", "last_order_date",
+                "categories_purchased",
+            }),
+            ("day_of_week", "$day_of_week", {"unique_customers"}),
+        ],
+    )
+    def test_pipeline_group_stage(self, name: str, key: str, fields: set[str]) -> None:
+        """Test each pipeline's grouping key and per-aggregation metrics."""
         from src.aggregation import DataAggregation
         
-        aggregator = DataAggregation()
-        result = aggregator.aggregate_by_category(sample_clean_data)
+        group = DataAggregation().build_pipelines()[name][0]["$group"]
         
-        # Electronics: 999.99 + 59.98 = 1059.97
-        electronics = result[result["_id"] == "Electronics"].iloc[0]
-        assert abs(electronics["total_revenue"] - 1059.97) < 0.01
-        
-        # Clothing: 75.00 + 50.00 = 125.00
-        clothing = result[result["_id"] == "Clothing"].iloc[0]
-        assert abs(clothing["total_revenue"] - 125.00) < 0.01
+        assert group["_id"] == key
+        assert set(group) - {"_id", "total_orders", "total_revenue", "avg_order_value"} == fields
+        if "unique_customers" in fields:
+            assert group["unique_customers"] == {"$addToSet": "$user_id"}
     
-    @patch('src.aggregation.MongoClient')
-    def test_avg_order_value(
-        self, mock_mongo: MagicMock, sample_clean_data: pd.DataFrame
-    ) -> None:
-        """Test average order value calculation."""
+    @pytest.mark.parametrize(
+        "name, sort",
+        [
+            ("category", {"total_revenue": -1}),
+            ("month", {"_id": 1}),
+            ("status", {"total_orders": -1}),
+            ("user", {"total_revenue": -1}),
+            ("day_of_week", {"_id": 1}),
+        ],
+    )
+    def test_pipeline_sort_order(self, name: str, sort: dict[str, int]) -> None:
+        """Test that each pipeline sorts its output as the dashboard expects."""
         from src.aggregation import DataAggregation
         
-        aggregator = DataAggregation()
-        result = aggregator.aggregate_by_category(sample_clean_data)
+        pipeline = DataAggregation().build_pipelines()[name]
         
-        # Electronics avg: (999.99 + 59.98) / 2 = 529.985
-        electronics = result[result["_id"] == "Electronics"].iloc[0]
-        assert abs(electronics["avg_order_value"] - 529.99) < 0.1
+        assert [stage["$sort"] for stage in pipeline if "$sort" in stage] == [sort]
     
-    @patch('src.aggregation.MongoClient')
-    def test_quantity_sum(
-        self, mock_mongo: MagicMock, sample_clean_data: pd.DataFrame
-    ) -> None:
-        """Test quantity summation."""
-        from src.aggregation import DataAggregation
-        
-        aggregator = DataAggregation()
-        result = aggregator.aggregate_by_category(sample_clean_data)
-        
-        # Electronics: 1 + 2 = 3
-        electronics = result[result["_id"] == "Electronics"].iloc[0]
-        assert electronics["total_quantity"] == 3
-        
-        # Clothing: 3 + 1 = 4
-        clothing = result[result["_id"] == "Clothing"].iloc[0]
-        assert clothing["total_quantity"] == 4
+    def test_pipeline_output_ids(self) -> None:
+        """Test that grouped keys are formatted into the published _id values."""
+        from src.aggregation import DAY_ORDER, DataAggregation
+        
+        pipelines = DataAggregation().build_pipelines()
+        
+        assert pipelines["user"][1:3] == [{"$sort": {"total_revenue": -1}}, {"$limit": 1000}]
+        assert pipelines["user"][-1]["$set"]["_id"] == {"$toString": "$_id"}
+        assert pipelines["day_of_week"][-1]["$set"]["_id"] == {
+            "$arrayElemAt": [DAY_ORDER, "$_id"]
+        }
+        assert pipelines["month"][-1]["$set"]["_id"]["$dateToString"]["format"] == "%Y-%m"
     
-    @patch('src.aggregation.MongoClient')
-    def test_day_of_week_ordering(
-        self, mock_mongo: MagicMock, sample_clean_data: pd.DataFrame
-    ) -> None:
-        """Test that days are properly ordered."""
+    def test_get_summary_stats(self) -> None:
+        """Test that summary stats come from a single server-side $group."""
         from src.aggregation import DataAggregation
         
         aggregator = DataAggregation()
-        result = aggregator.aggregate_day_of_week(sample_clean_data)
-        
-        # Get the order of days in result
-        days = result["_id"].tolist()
-        expected_order = ["Monday", "Tuesday", "Saturday", "Sunday"]
-        
-        # Check that the days appear in correct order
-        day_indices = [expected_order.index(d) for d in days]
-        assert day_indices == sorted(day_indices)
+        collection = aggregator.db.__getitem__.return_value
+        collection.aggregate.return_value = iter([{
+            "total_records": 5,
+            "unique_users": 4,
+            "unique_categories": 3,
+            "total_revenue": 1384.96,
+            "avg_order_value": 276.99,
+            "date_min": datetime(2024, 1, 15),
+            "date_max": datetime(2024, 2, 25),
+        }])
+        
+        summary = aggregator.get_summary_stats()
+        
+        assert summary["unique_users"] == 4
+        assert summary["total_revenue"] == 1384.96
+        assert summary["date_range_start"] == "2024-01-15 00:00:00"
+        pipeline = collection.aggregate.call_args.args[0]
+        assert pipeline[0]["$group"]["_id"] is None
+
@@ -1,210 +1,197 @@
 """Test suite for the data cleaning module."""
 
 import pytest
+from typing import Callable
 from unittest.mock import patch, MagicMock
 import pandas as pd
 import numpy as np
 
+from src.cleaning import CLEAN_INDEXES, RAW_SCHEMA, DataCleaning
+
+_EXPECTED_STATUSES = frozenset({"completed", "pending", "cancelled", "returned", "unknown"})
+
+
+@pytest.fixture(scope="module")
+def cleaner(mongo_client: MagicMock) -> DataCleaning:
+    """Create one DataCleaning instance shared by the module's tests."""
+    return DataCleaning(mongo_client)
+
+
+def _check_removes_duplicates(cleaned: pd.DataFrame) -> None:
+    assert len(cleaned) == 2  # Duplicate removed
+
+
+def _check_normalizes_text(cleaned: pd.DataFrame) -> None:
+    assert cleaned.at[0, "product_name"] == "LAPTOP"  # Trimmed
+    assert cleaned.at[0, "category"] == "Electronics"  # Title case
+    assert cleaned.at[0, "status"] == "completed"  # Lowercase
+
+
+def _check_standardizes_status(cleaned: pd.DataFrame) -> None:
+    statuses = set(cleaned["status"].unique())
+    
+    assert isinstance(cleaned["status"].dtype, pd.CategoricalDtype)
+    assert _EXPECTED_STATUSES <= statuses
+
+
+def _check_fills_missing_values(cleaned: pd.DataFrame) -> None:
+    assert cleaned.at[0, "product_name"] == "Unknown Product"
+    assert cleaned.at[0, "category"] == "Uncategorized"
+    assert cleaned.at[0, "status"] == "unknown"
+
+
+def _check_filters_invalid_prices(cleaned: pd.DataFrame) -> None:
+    assert len(cleaned) == 1
+    assert cleaned.at[0, "price"] > 0
+
+
+def _check_adds_derived_columns(cleaned: pd.DataFrame) -> None:
+    assert cleaned.at[0, "total_amount"] == 200.0
+    assert cleaned.at[0, "year"] == 2024
+    assert cleaned.at[0, "month"] == 3
+    assert cleaned.at[0, "year_month"] == 202403
+    assert cleaned.at[0, "day_of_week"] == 4  # Friday
+
+
+def _check_filters_zero_quantity(cleaned: pd.DataFrame) -> None:
+    assert len(cleaned) == 1
+    assert cleaned.at[0, "quantity"] > 0
+
+
+# (build, check) pairs: build makes the input frame from the make_df factory,
+# check asserts on the cleaned result
+CLEAN_DATA_CASES = [
+    pytest.param(
+        lambda make_df: make_df().iloc[[0, 0, 1]].reset_index(drop=True),
+        _check_removes_duplicates,
+        id="removes_duplicates",
+    ),
+    pytest.param(
+        lambda make_df: make_df(
+            product_name=["  LAPTOP  "], category=["electronics"], status=["COMPLETED"]
+        ),
+        _check_normalizes_text,
+        id="normalizes_text",
+    ),
+    pytest.param(
+        lambda make_df: make_df(
+            status=["complete", "PENDING", "canceled", "refunded", "invalid"]
+        ),
+        _check_standardizes_status,
+        id="standardizes_status",
+    ),
+    pytest.param(
+        lambda make_df: make_df(product_name=[None], category=[None], status=[None]),
+        _check_fills_missing_values,
+        id="fills_missing_values",
+    ),
+    pytest.param(
+        lambda make_df: make_df().head(1).assign(
+            product_name=None,
+            category=pd.Categorical([None], categories=["Electronics"]),
+            status=pd.Categorical([None], categories=["completed"]),
+        ),
+        _check_fills_missing_values,
+        id="fills_missing_categoricals",
+    ),
+    pytest.param(
+        lambda make_df: make_df(price=[-10.0, 50.0]),
+        _check_filters_invalid_prices,
+        id="filters_invalid_prices",
+    ),
+    pytest.param(
+        lambda make_df: make_df(
+            price=[100.0], quantity=[2], order_date=["2024-03-15"]  # Friday
+        ),
+        _check_adds_derived_columns,
+        id="adds_derived_columns",
+    ),
+    pytest.param(
+        lambda make_df: make_df(
+            price=[100.0], quantity=[2], order_date=pd.to_datetime(["2024-03-15"])
+        ),
+        _check_adds_derived_columns,
+        id="adds_derived_columns_from_datetimes",
+    ),
+    pytest.param(
+        lambda make_df: make_df(quantity=[0, 1]),
+        _check_filters_zero_quantity,
+        id="filters_zero_quantity",
+    ),
+]
+
 
 class TestDataCleaning:
     """Test cases for DataCleaning class."""
     
-    @pytest.fixture
-    def sample_raw_data(self) -> pd.DataFrame:
-        """Create sample raw data for testing."""
-        return pd.DataFrame({
-            "user_id": [1, 2, 3, 4, 5],
-            "order_id": ["ORD-001", "ORD-002", "ORD-003", "ORD-004", "ORD-005"],
-            "product_id": ["PROD-001", "PROD-002", "PROD-003", "PROD-004", "PROD-005"],
-            "product_name": ["Laptop", "Mouse", "Chair", "T-Shirt", "Watch"],
-            "category": ["electronics", "accessories", "furniture", "clothing", "accessories"],
-            "price": [999.99, 29.99, 199.99, 25.00, 150.00],
-            "quantity": [1, 2, 1, 3, 1],
-            "order_date": ["2024-01-15", "2024-01-16", "2024-01-17", "2024-01-18", "2024-01-19"],
-            "status": ["completed", "PENDING", "canceled", "refunded", "complete"],
-        })
-    
-    @patch('src.cleaning.MongoClient')
-    def test_initialization(self, mock_mongo: MagicMock) -> None:
+    def test_initialization(self, mock_get_client: MagicMock) -> None:
         """Test DataCleaning initialization."""
-        from src.cleaning import DataCleaning
-        
         cleaner = DataCleaning()
         assert cleaner.client is not None
-        mock_mongo.assert_called_once()
+        mock_get_client.assert_called_once()
     
-    @patch('src.cleaning.MongoClient')
-    def test_clean_data_removes_duplicates(self, mock_mongo: MagicMock) -> None:
-        """Test that duplicate rows are removed."""
-        from src.cleaning import DataCleaning
-        
+    @patch('src.cleaning.find_pandas_all')
+    def test_read_from_mongodb_uses_schema(self, mock_find: MagicMock) -> None:
+        """Test that reads go through PyMongoArrow with the given schema."""
+        mock_find.return_value = pd.DataFrame({"user_id": [1, 2]})
         cleaner = DataCleaning()
         
-        # Create data with duplicates
-        df = pd.DataFrame({
-            "user_id": [1, 1, 2],
-            "order_id": ["ORD-001", "ORD-001", "ORD-002"],
-            "product_id": ["PROD-001", "PROD-001", "PROD-002"],
-            "product_name": ["Laptop", "Laptop", "Mouse"],
-            "category": ["Electronics", "Electronics", "Accessories"],
-            "price": [999.99, 999.99, 29.99],
-            "quantity": [1, 1, 2],
-            "order_date": ["2024-01-15", "2024-01-15", "2024-01-16"],
-            "status": ["completed", "completed", "pending"],
-        })
+        df = cleaner.read_from_mongodb("raw_data", RAW_SCHEMA)
         
-        cleaned = cleaner.clean_data(df)
-        assert len(cleaned) == 2  # Duplicate removed
+        assert len(df) == 2
+        _, kwargs = mock_find.call_args
+        assert kwargs["schema"] is RAW_SCHEMA
+        assert kwargs["projection"] is None
     
-    @patch('src.cleaning.MongoClient')
-    def test_clean_data_normalizes_text(self, mock_mongo: MagicMock) -> None:
-        """Test that text fields are normalized."""
-        from src.cleaning import DataCleaning
-        
-        cleaner = DataCleaning()
-        
-        df = pd.DataFrame({
-            "user_id": [1],
-            "order_id": ["ORD-001"],
-            "product_id": ["PROD-001"],
-            "product_name": ["  LAPTOP  "],
-            "category": ["electronics"],
-            "price": [999.99],
-            "quantity": [1],
-            "order_date": ["2024-01-15"],
-            "status": ["COMPLETED"],
-        })
-        
-        cleaned = cleaner.clean_data(df)
-        row = cleaned.iloc[0]
-        
-        assert row["product_name"] == "LAPTOP"  # Trimmed
-        assert row["category"] == "Electronics"  # Title case
-        assert row["status"] == "completed"  # Lowercase
-    
-    @patch('src.cleaning.MongoClient')
-    def test_clean_data_standardizes_status(self, mock_mongo: MagicMock) -> None:
-        """Test that status values are standardized."""
-        from src.cleaning import DataCleaning
-        
-        cleaner = DataCleaning()
-        
-        df = pd.DataFrame({
-            "user_id": [1, 2, 3, 4, 5],
-            "order_id": ["ORD-001", "ORD-002", "ORD-003", "ORD-004", "ORD-005"],
-            "product_id": ["P1", "P2", "P3", "P4", "P5"],
-            "product_name": ["A", "B", "C", "D", "E"],
-            "category": ["Cat1", "Cat2", "Cat3", "Cat4", "Cat5"],
-            "price": [10.0, 20.0, 30.0, 40.0, 50.0],
-            "quantity": [1, 1, 1, 1, 1],
-            "order_date": ["2024-01-15"] * 5,
-            "status": ["complete", "PENDING", "canceled", "refunded", "invalid"],
-        })
-        
-        cleaned = cleaner.clean_data(df)
-        statuses = cleaned["status"].tolist()
-        
-        assert "completed" in statuses
-        assert "pending" in statuses
-        assert "cancelled" in statuses
-        assert "returned" in statuses
-        assert "unknown" in statuses
-    
-    @patch('src.cleaning.MongoClient')
-    def test_clean_data_fills_missing_values(self, mock_mongo: MagicMock) -> None:
-        """Test that missing values are filled with defaults."""
-        from src.cleaning import DataCleaning
-        
-        cleaner = DataCleaning()
-        
-        df = pd.DataFrame({
-            "user_id": [1],
-            "order_id": ["ORD-001"],
-            "product_id": ["PROD-001"],
-            "product_name": [None],
-            "category": [None],
-            "price": [100.0],
-            "quantity": [1],
-            "order_date": ["2024-01-15"],
-            "status": [None],
-        })
-        
-        cleaned = cleaner.clean_data(df)
-        row = cleaned.iloc[0]
-        
-        assert row["product_name"] == "Unknown Product"
-        assert row["category"] == "Uncategorized"
-        assert row["status"] == "unknown"
+    @pytest.mark.parametrize("build, check", CLEAN_DATA_CASES)
+    def test_clean_data(
+        self,
+        cleaner: DataCleaning,
+        make_df: Callable[..., pd.DataFrame],
+        build: Callable[[Callable[..., pd.DataFrame]], pd.DataFrame],
+        check: Callable[[pd.DataFrame], None],
+    ) -> None:
+        """Test each clean_data transformation on a frame built for it."""
+        check(cleaner.clean_data(build(make_df)))
     
-    @patch('src.cleaning.MongoClient')
-    def test_clean_data_filters_invalid_prices(self, mock_mongo: MagicMock) -> None:
-        """Test that negative prices are filtered out."""
-        from src.cleaning import DataCleaning
-        
+    def test_write_to_mongodb(self) -> None:
+        """Test unordered bulk load into a freshly dropped collection."""
         cleaner = DataCleaning()
-        
-        df = pd.DataFrame({
-            "user_id": [1, 2],
-            "order_id": ["ORD-001", "ORD-002"],
-            "product_id": ["PROD-001", "PROD-002"],
-            "product_name": ["A", "B"],
-            "category": ["Cat1", "Cat2"],
-            "price": [-10.0, 50.0],
-            "quantity": [1, 1],
-            "order_date": ["2024-01-15", "2024-01-16"],
-            "status": ["completed", "completed"],
-        })
-        
-        cleaned = cleaner.clean_data(df)
-        assert len(cleaned) == 1
-        assert cleaned.iloc[0]["price"] > 0
+        collection = cleaner.db.__getitem__.return_value
+        df = pd.DataFrame({"user_id": [1, 2, 3]})
+        
+        cleaner.write_to_mongodb(df, "clean_data")
+        
+        collection.drop.assert_called_once()
+        (batch,), insert_kwargs = collection.insert_many.call_args
+        assert batch == [{"user_id": 1}, {"user_id": 2}, {"user_id": 3}]
+        assert insert_kwargs["ordered"] is False
+        assert insert_kwargs["bypass_document_validation"] is True
+        # Old index specs are not replayed; create_indexes owns the index set
+        collection.index_information.assert_not_called()
+        collection.create_indexes.assert_not_called()
     
-    @patch('src.cleaning.MongoClient')
-    def test_clean_data_adds_derived_columns(self, mock_mongo: MagicMock) -> None:
-        """Test that derived columns are added."""
-        from src.cleaning import DataCleaning
-        
+    def test_create_indexes(self) -> None:
+        """Test that the clean collection indexes are built in one call."""
         cleaner = DataCleaning()
+        cleaner.create_indexes()
         
-        df = pd.DataFrame({
-            "user_id": [1],
-            "order_id": ["ORD-001"],
-            "product_id": ["PROD-001"],
-            "product_name": ["Laptop"],
-            "category": ["Electronics"],
-            "price": [100.0],
-            "quantity": [2],
-            "order_date": ["2024-03-15"],  # Friday
-            "status": ["completed"],
-        })
-        
-        cleaned = cleaner.clean_data(df)
-        row = cleaned.iloc[0]
-        
-        assert row["total_amount"] == 200.0
-        assert row["year"] == 2024
-        assert row["month"] == 3
-        assert row["day_of_week"] == "Friday"
+        collection = cleaner.db.__getitem__.return_value
+        collection.create_indexes.assert_called_once_with(CLEAN_INDEXES)
+
     
-    @patch('src.cleaning.MongoClient')
-    def test_clean_data_filters_zero_quantity(self, mock_mongo: MagicMock) -> None:
-        """Test that zero quantity rows are filtered."""
-        from src.cleaning import DataCleaning
-        
+    def test_run_cleaning_pipeline_builds_indexes_once(
+        self, make_df: Callable[..., pd.DataFrame]
+    ) -> None:
+        """Test that indexes are built in a single pass after the bulk load."""
         cleaner = DataCleaning()
+        collection = cleaner.db.__getitem__.return_value
         
-        df = pd.DataFrame({
-            "user_id": [1, 2],
-            "order_id": ["ORD-001", "ORD-002"],
-            "product_id": ["PROD-001", "PROD-002"],
-            "product_name": ["A", "B"],
-            "category": ["Cat1", "Cat2"],
-            "price": [10.0, 50.0],
-            "quantity": [0, 1],
-            "order_date": ["2024-01-15", "2024-01-16"],
-            "status": ["completed", "completed"],
-        })
+        with patch.object(cleaner, "read_from_mongodb", return_value=make_df()):
+            cleaner.run_cleaning_pipeline()
         
-        cleaned = cleaner.clean_data(df)
-        assert len(cleaned) == 1
-        assert cleaned.iloc[0]["quantity"] > 0
+        collection.create_indexes.assert_called_once_with(CLEAN_INDEXES)
+        calls = [name for name, _, _ in collection.mock_calls]
+        assert calls.index("create_indexes") > max(
+            i for i, name in enumerate(calls) if name == "insert_many"
+        )
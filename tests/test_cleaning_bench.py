@@ -0,0 +1,32 @@
+"""Benchmarks for the data cleaning module.
+
+Skipped in the default run (``--benchmark-skip`` in pytest.ini); use
+``pytest --benchmark-only`` to run them.
+"""
+
+import pytest
+from unittest.mock import MagicMock
+import pandas as pd
+import pyarrow as pa
+
+pytest.importorskip("pytest_benchmark")
+
+from scripts.generate_data import generate_data
+from src.cleaning import DataCleaning
+
+
+@pytest.fixture(scope="module")
+def raw_10k() -> pd.DataFrame:
+    """Create 10k rows of generated raw data with Arrow-backed columns."""
+    table = pa.Table.from_pandas(generate_data(10_000), preserve_index=False)
+    return table.to_pandas(types_mapper=pd.ArrowDtype)
+
+
+@pytest.mark.benchmark(group="clean")
+def test_clean_10k(benchmark, mongo_client: MagicMock, raw_10k: pd.DataFrame) -> None:
+    """Benchmark clean_data on 10k generated rows."""
+    cleaner = DataCleaning(mongo_client)
+    
+    cleaned = benchmark(cleaner.clean_data, raw_10k)
+    
+    assert 0 < len(cleaned) <= len(raw_10k)
@@ -1,12 +1,25 @@
 """Test suite for the data ingestion module."""
 
+import bson
+import math
 import pytest
-from unittest.mock import Mock, patch, MagicMock
+from pathlib import Path
+from typing import Callable
+from unittest.mock import patch, MagicMock
+import numpy as np
 import pandas as pd
 
+from src.config import settings
+from src.ingestion import DataIngestion, _insert_batch_size
 from src.models import RawDataModel
 
 
+@pytest.fixture(scope="module")
+def ingestion(mongo_client: MagicMock) -> DataIngestion:
+    """Create one DataIngestion instance shared by the module's tests."""
+    return DataIngestion(mongo_client)
+
+
 class TestRawDataModel:
     """Test cases for RawDataModel validation."""
     
@@ -24,7 +37,7 @@ class TestRawDataModel:
             "status": "completed"
         }
         
-        model = RawDataModel(**data)
+        model = RawDataModel.model_validate(data)
         
         assert model.user_id == 1
         assert model.order_id == "ORD-001"
@@ -42,7 +55,7 @@ class TestRawDataModel:
         }
         
         with pytest.raises(ValueError):
-            RawDataModel(**data)
+            RawDataModel.model_validate(data)
     
     def test_invalid_quantity(self) -> None:
         """Test validation rejects zero quantity."""
@@ -56,7 +69,7 @@ class TestRawDataModel:
         }
         
         with pytest.raises(ValueError):
-            RawDataModel(**data)
+            RawDataModel.model_validate(data)
     
     def test_invalid_price(self) -> None:
         """Test validation rejects negative price."""
@@ -70,7 +83,7 @@ class TestRawDataModel:
         }
         
         with pytest.raises(ValueError):
-            RawDataModel(**data)
+            RawDataModel.model_validate(data)
     
     def test_optional_fields(self) -> None:
         """Test that optional fields can be None."""
@@ -83,158 +96,234 @@ class TestRawDataModel:
             "order_date": "2024-01-15"
         }
         
-        model = RawDataModel(**data)
+        model = RawDataModel.model_validate(data)
         
         assert model.product_name is None
         assert model.category is None
         assert model.status is None
+    
+    def test_validate_columns(self) -> None:
+        """Test column-wise validation flags the same rows the model rejects."""
+        df = pd.DataFrame({
+            "user_id": [1, -1, 2, 3],
+            "order_id": ["ORD-001", "ORD-002", "", "ORD-004"],
+            "product_id": ["PROD-001", "PROD-002", "PROD-003", "PROD-004"],
+            "price": [99.99, 10.0, 5.0, float("nan")],
+            "quantity": [1, 1, 1, 1],
+            "order_date": ["2024-01-15"] * 4,
+        })
+        
+        mask = RawDataModel.validate_columns(df)
+        
+        assert mask.tolist() == [True, False, False, False]
+    
+    def test_validate_columns_rejects_fractional_ints(self) -> None:
+        """Test that non-integral user_id and quantity values are rejected."""
+        df = pd.DataFrame({
+            "user_id": [1.0, 2.5, 3.0],
+            "order_id": ["ORD-001", "ORD-002", "ORD-003"],
+            "product_id": ["PROD-001", "PROD-002", "PROD-003"],
+            "price": [99.99, 10.0, 5.0],
+            "quantity": [2.0, 1.0, 2.7],
+            "order_date": ["2024-01-15"] * 3,
+        })
+        
+        mask = RawDataModel.validate_columns(df)
+        
+        assert mask.tolist() == [True, False, False]
 
 
 class TestDataIngestion:
     """Test cases for DataIngestion class."""
     
-    @patch('src.ingestion.MongoClient')
-    def test_initialization(self, mock_mongo_client: Mock) -> None:
+    def test_initialization(self, mock_get_client: MagicMock) -> None:
         """Test DataIngestion initialization."""
-        mock_instance = MagicMock()
-        mock_mongo_client.return_value = mock_instance
-        
-        from src.ingestion import DataIngestion
         ingestion = DataIngestion()
         
         assert ingestion.client is not None
-        mock_mongo_client.assert_called_once()
+        mock_get_client.assert_called_once()
+    
+    def test_initialization_with_shared_client(self, mock_get_client: MagicMock) -> None:
+        """Test that a provided client is reused and not closed."""
+        shared_client = MagicMock()
+        ingestion = DataIngestion(shared_client)
+        ingestion.close()
+        
+        assert ingestion.client is shared_client
+        mock_get_client.assert_not_called()
+        shared_client.close.assert_not_called()
+    
+    @pytest.mark.parametrize(
+        "overrides, chunk_size, expected_user_ids",
+        [
+            pytest.param({"user_id": [1, 2]}, 10, [[1, 2]], id="valid_records"),
+            pytest.param({"user_id": [-1, 2]}, 10, [[2]], id="invalid_records"),
+            pytest.param({"user_id": [-1]}, 10, [], id="all_invalid"),
+            # 5 valid records with a chunk size of 2 give chunks of 2, 2 and 1
+            pytest.param({}, 2, [[1, 2], [3, 4], [5]], id="chunking"),
+        ],
+    )
+    @pytest.mark.parametrize("frame_factory", ["make_df", "make_arrow_df"])
+    def test_validate_and_chunk_data(
+        self,
+        request: pytest.FixtureRequest,
+        ingestion: DataIngestion,
+        frame_factory: str,
+        overrides: dict[str, list],
+        chunk_size: int,
+        expected_user_ids: list[list[int]],
+    ) -> None:
+        """Test that invalid records are dropped and valid ones chunked in order."""
+        test_data = request.getfixturevalue(frame_factory)(**overrides)
+        
+        chunks = list(ingestion.validate_and_chunk_data(test_data, chunk_size=chunk_size))
+        
+        user_ids = [[record["user_id"] for record in chunk] for chunk in chunks]
+        assert user_ids == expected_user_ids
+        # Records hold plain Python values whatever the frame's backing dtypes
+        for chunk in chunks:
+            for record in chunk:
+                bson.encode(record)
+    
+    def test_generator_is_lazy(
+        self, ingestion: DataIngestion, make_df: Callable[..., pd.DataFrame]
+    ) -> None:
+        """Test that records are serialized one chunk at a time."""
+        large_df = make_df().iloc[np.arange(20_000) % 5].reset_index(drop=True)
+        chunk_size = 1000
+        
+        with patch.object(
+            ingestion, "serialize_chunk", wraps=ingestion.serialize_chunk
+        ) as serialize_chunk:
+            chunks = ingestion.validate_and_chunk_data(large_df, chunk_size=chunk_size)
+            first = next(chunks)
+            
+            assert len(first) == chunk_size
+            serialize_chunk.assert_called_once()
+            
+            rest = list(chunks)
+        
+        assert len(rest) == math.ceil(len(large_df) / chunk_size) - 1
+        assert serialize_chunk.call_count == math.ceil(len(large_df) / chunk_size)
     
-    @patch('src.ingestion.MongoClient')
-    def test_validate_and_chunk_data_valid_records(self, mock_mongo_client: Mock) -> None:
-        """Test validation with valid records."""
-        mock_instance = MagicMock()
-        mock_mongo_client.return_value = mock_instance
+    def test_ingest_from_csv_reads_in_chunks(self, tmp_path: Path) -> None:
+        """Test that CSV files are streamed and inserted chunk by chunk."""
+        csv_path = tmp_path / "raw.csv"
+        pd.DataFrame({
+            "user_id": [1, 2, 3, 4, 5],
+            "order_id": [f"ORD-{i}" for i in range(5)],
+            "product_id": [f"PROD-{i}" for i in range(5)],
+            "price": [10.0] * 5,
+            "quantity": [1] * 5,
+            "order_date": ["2024-01-15"] * 5,
+        }).to_csv(csv_path, index=False)
         
-        from src.ingestion import DataIngestion
         ingestion = DataIngestion()
+        writer = ingestion.collection.with_options.return_value
+        writer.insert_many.side_effect = (
+            lambda chunk, **kwargs: MagicMock(inserted_ids=list(range(len(chunk))))
+        )
+        
+        with patch.object(settings, "chunk_size", 2):
+            metrics = ingestion.ingest_from_csv(csv_path)
+        
+        assert writer.insert_many.call_count == 3
+        assert writer.insert_many.call_args.kwargs["ordered"] is False
+        assert metrics.records_processed == 5
+    
+    def test_strict_validation_samples_once_per_file(self, tmp_path: Path) -> None:
+        """Test that the RawDataModel sample check runs once, not once per frame."""
+        csv_path = tmp_path / "raw.csv"
+        pd.DataFrame({
+            "user_id": [1, 2, 3, 4, 5],
+            "order_id": [f"ORD-{i}" for i in range(5)],
+            "product_id": [f"PROD-{i}" for i in range(5)],
+            "price": [10.0] * 5,
+            "quantity": [1] * 5,
+            "order_date": ["2024-01-15"] * 5,
+        }).to_csv(csv_path, index=False)
         
-        # Create valid test data
-        test_data = pd.DataFrame([
-            {
-                "user_id": 1,
-                "order_id": "ORD-001",
-                "product_id": "PROD-001",
-                "product_name": "Test Product",
-                "category": "Electronics",
-                "price": 99.99,
-                "quantity": 2,
-                "order_date": "2024-01-15",
-                "status": "completed"
-            },
-            {
-                "user_id": 2,
-                "order_id": "ORD-002",
-                "product_id": "PROD-002",
-                "product_name": "Another Product",
-                "category": "Clothing",
-                "price": 49.99,
-                "quantity": 1,
-                "order_date": "2024-01-16",
-                "status": "pending"
-            }
-        ])
-        
-        chunks = list(ingestion.validate_and_chunk_data(test_data, chunk_size=10))
-        
-        assert len(chunks) == 1  # All in one chunk
-        assert len(chunks[0]) == 2  # Both records valid
-        assert chunks[0][0]["user_id"] == 1
-        assert chunks[0][1]["user_id"] == 2
-    
-    @patch('src.ingestion.MongoClient')
-    def test_validate_and_chunk_data_invalid_records(self, mock_mongo_client: Mock) -> None:
-        """Test validation filters out invalid records."""
-        mock_instance = MagicMock()
-        mock_mongo_client.return_value = mock_instance
-        
-        from src.ingestion import DataIngestion
         ingestion = DataIngestion()
+        writer = ingestion.collection.with_options.return_value
+        writer.insert_many.side_effect = (
+            lambda chunk, **kwargs: MagicMock(inserted_ids=list(range(len(chunk))))
+        )
+        
+        with (
+            patch.object(settings, "chunk_size", 2),
+            patch.object(settings, "strict_validation", True),
+            patch("src.ingestion.RAW_LIST_ADAPTER") as adapter,
+        ):
+            ingestion.ingest_from_csv(csv_path)
+        
+        adapter.validate_python.assert_called_once()
+    
+    def test_ingest_from_csv_drops_malformed_numbers(self, tmp_path: Path) -> None:
+        """Test that a non-numeric cell drops its row instead of failing the file."""
+        csv_path = tmp_path / "raw.csv"
+        pd.DataFrame({
+            "user_id": ["1", "abc", "3"],
+            "order_id": ["ORD-1", "ORD-2", "ORD-3"],
+            "product_id": ["PROD-1", "PROD-2", "PROD-3"],
+            "price": ["10.0", "20.0", "n/a"],
+            "quantity": ["1", "2", "3"],
+            "order_date": ["2024-01-15"] * 3,
+        }).to_csv(csv_path, index=False)
         
-        # Create test data with one invalid record (negative user_id)
-        test_data = pd.DataFrame([
-            {
-                "user_id": -1,  # Invalid
-                "order_id": "ORD-001",
-                "product_id": "PROD-001",
-                "price": 99.99,
-                "quantity": 2,
-                "order_date": "2024-01-15"
-            },
-            {
-                "user_id": 2,  # Valid
-                "order_id": "ORD-002",
-                "product_id": "PROD-002",
-                "price": 49.99,
-                "quantity": 1,
-                "order_date": "2024-01-16"
-            }
-        ])
-        
-        chunks = list(ingestion.validate_and_chunk_data(test_data, chunk_size=10))
-        
-        # Should have 1 chunk with 1 valid record
-        assert len(chunks) == 1
-        assert len(chunks[0]) == 1
-        assert chunks[0][0]["user_id"] == 2
-    
-    @patch('src.ingestion.MongoClient')
-    def test_validate_and_chunk_data_all_invalid(self, mock_mongo_client: Mock) -> None:
-        """Test validation with all invalid records."""
-        mock_instance = MagicMock()
-        mock_mongo_client.return_value = mock_instance
-        
-        from src.ingestion import DataIngestion
         ingestion = DataIngestion()
+        writer = ingestion.collection.with_options.return_value
+        writer.insert_many.side_effect = (
+            lambda chunk, **kwargs: MagicMock(inserted_ids=list(range(len(chunk))))
+        )
         
-        # Create test data with all invalid records
-        test_data = pd.DataFrame([
-            {
-                "user_id": -1,
-                "order_id": "ORD-001",
-                "product_id": "PROD-001",
-                "price": 99.99,
-                "quantity": 2,
-                "order_date": "2024-01-15"
-            }
-        ])
-        
-        chunks = list(ingestion.validate_and_chunk_data(test_data, chunk_size=10))
-        
-        # Should have no chunks (no valid records)
-        assert len(chunks) == 0
-
-    @patch('src.ingestion.MongoClient')
-    def test_chunking_behavior(self, mock_mongo_client: Mock) -> None:
-        """Test that data is properly chunked."""
-        mock_instance = MagicMock()
-        mock_mongo_client.return_value = mock_instance
+        metrics = ingestion.ingest_from_csv(csv_path)
+        
+        records = writer.insert_many.call_args.args[0]
+        assert [record["user_id"] for record in records] == [1]
+        assert metrics.records_processed == 1
+    
+    def test_ingest_from_parquet_stores_datetimes_as_iso_strings(
+        self, tmp_path: Path
+    ) -> None:
+        """Test that timestamp order dates are inserted as ISO strings."""
+        parquet_path = tmp_path / "raw.parquet"
+        pd.DataFrame({
+            "user_id": [1, 2],
+            "order_id": ["ORD-1", "ORD-2"],
+            "product_id": ["PROD-1", "PROD-2"],
+            "price": [10.0, 20.0],
+            "quantity": [1, 2],
+            "order_date": pd.to_datetime(["2024-01-15 00:00", "2024-01-16 08:30"]),
+        }).to_parquet(parquet_path, index=False)
+        
+        ingestion = DataIngestion()
+        writer = ingestion.collection.with_options.return_value
+        writer.insert_many.side_effect = (
+            lambda chunk, **kwargs: MagicMock(inserted_ids=list(range(len(chunk))))
+        )
+        
+        metrics = ingestion.ingest_from_parquet(parquet_path)
         
-        from src.ingestion import DataIngestion
+        records = writer.insert_many.call_args.args[0]
+        assert [record["order_date"] for record in records] == [
+            "2024-01-15T00:00:00", "2024-01-16T08:30:00"
+        ]
+        assert metrics.records_processed == 2
+    
+    def test_insert_batch_size(self) -> None:
+        """Test that insert batches are sized from the encoded record size."""
+        small = {"order_id": "ORD-001"}
+        large = {"payload": "x" * 1_000_000}
+        
+        assert _insert_batch_size(small) == settings.insert_batch_size
+        assert _insert_batch_size(large) == 100
+    
+    def test_get_row_count(self) -> None:
+        """Test that row counts use the metadata estimate unless exact is requested."""
         ingestion = DataIngestion()
+        ingestion.collection.estimated_document_count.return_value = 10
+        ingestion.collection.count_documents.return_value = 9
         
-        # Create 5 valid records
-        test_data = pd.DataFrame([
-            {
-                "user_id": i,
-                "order_id": f"ORD-{i:03d}",
-                "product_id": f"PROD-{i:03d}",
-                "price": 10.00 * i,
-                "quantity": 1,
-                "order_date": "2024-01-15"
-            }
-            for i in range(1, 6)  # 5 records with user_id 1-5
-        ])
-        
-        # Chunk size of 2 should produce 3 chunks (2, 2, 1)
-        chunks = list(ingestion.validate_and_chunk_data(test_data, chunk_size=2))
-        
-        assert len(chunks) == 3
-        assert len(chunks[0]) == 2
-        assert len(chunks[1]) == 2
-        assert len(chunks[2]) == 1
+        assert ingestion.get_row_count() == 10
+        assert ingestion.get_row_count(exact=True) == 9
+